@@ -0,0 +1,85 @@
+"""Timing of the sprites' animations, whose frames are listed in the tables in constants.
+
+Sprites don't look their images up every tick - a Clock tells when the frame of an animation
+changes and only then the image is swapped. Looping animations of sprites which can't be told
+apart (e.g. monsters walking, bombs ticking) are played by one clock shared by all of them."""
+import bisect
+
+import assets
+import constants
+
+
+class Animation:
+    """Frame timing of an animation with given number of frames, played at given speed (frames
+    per tick). Frames change at the same ticks as when the speed was added to a float frame
+    every tick, so that e.g. a death animation takes as long as it always did."""
+    def __init__(self, length, speed, loop=True):
+        self.length = length
+        self.loop = loop
+        # Ticks at which the frames start, the last one is the end of the animation
+        self.starts = [0]
+        frame = 0.0
+        tick = 0
+        while len(self.starts) <= length:
+            tick += 1
+            frame += speed
+            while len(self.starts) <= min(int(frame), length):
+                self.starts.append(tick)
+
+
+# Walking of the player and the monsters, ticking of the bombs
+MOVEMENT = Animation(4, constants.ANIMATION_SPEED)
+PLAYER_DEATH = Animation(len(constants.BOMBERMAN_DEATH_ANIMATION), constants.ANIMATION_SPEED, loop=False)
+MONSTER_DEATH = Animation(4, constants.ANIMATION_SPEED, loop=False)
+BLAST = Animation(7, constants.BLAST_ANIMATION_SPEED)
+SOFT_BLOCK = Animation(len(constants.SOFT_BLOCK_DISAPPEARING_ANIMATION), constants.BLOCK_ANIMATION_SPEED, loop=False)
+
+
+class Clock:
+    """Plays an animation. Frame is the index of the current frame - equal to the animation's
+    length once an animation which doesn't loop has ended."""
+    __slots__ = ("animation", "ticks", "frame", "changed")
+
+    def __init__(self, animation, frame=0):
+        self.animation = animation
+        self.ticks = animation.starts[frame]
+        self.frame = frame
+        self.changed = False
+
+    def tick(self):
+        """Advances the animation by one tick. Returns whether the frame changed."""
+        animation = self.animation
+        self.ticks += 1
+        self.changed = self.frame < animation.length and self.ticks >= animation.starts[self.frame + 1]
+        if self.changed:
+            if animation.loop and self.ticks == animation.starts[-1]:
+                self.ticks = 0
+            self.frame = bisect.bisect_right(animation.starts, self.ticks) - 1
+        return self.changed
+
+
+class Animator:
+    """Clocks shared by the sprites of a game, advanced once per tick, and a count of the images
+    swapped by the sprites (see show)."""
+    def __init__(self):
+        self.clocks = {}
+        self.swaps = 0
+
+    def get_clock(self, animation):
+        """Returns the clock shared by every sprite playing the animation."""
+        clock = self.clocks.get(animation)
+        if clock is None:
+            clock = self.clocks[animation] = Clock(animation)
+        return clock
+
+    def tick(self):
+        for clock in self.clocks.values():
+            clock.tick()
+
+    def show(self, sprite, image_pos, angle=0):
+        """Swaps image of the sprite for the one at given position of the sprite sheet, unless
+        it's already shown. Sprites keep the shown position in their shown attribute."""
+        if image_pos != sprite.shown:
+            sprite.image = assets.Assets.get_image_at(image_pos[0], image_pos[1], angle)
+            sprite.shown = image_pos
+            self.swaps += 1
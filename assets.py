@@ -1,32 +1,200 @@
+import hashlib
+import os
+import pickle
+
 import constants
+import levels
 import pygame
 
+# Directory of the game, where the assets are looked for
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Assets baked by Assets.load, read instead of decoding the files when they haven't changed
+CACHE_PATH = os.path.join(DIRECTORY, "assets.cache")
+# Has to be increased whenever the content of the cache changes
+CACHE_VERSION = 1
+
+
+def get_path(path):
+    """Returns path of a file given relative to the current directory or to the game's directory."""
+    if os.path.isabs(path) or os.path.exists(path):
+        return path
+    return os.path.join(DIRECTORY, path)
+
 
 class Assets:
+    # Frames sliced from the sprite sheet once, keyed by (x, y, rotation)
+    FRAMES = {}
+    # Number of surfaces allocated by get_image_at, used to compare atlas with slicing on demand
+    allocations = 0
+    # Font's characters rendered once, keyed by (character, color)
+    GLYPHS = {}
+    # Positions (in cells) of the rotated frames baked below the sprite sheet, keyed by (x, y, rotation)
+    ROTATED = {}
+    # Whether the last load read the baked assets from the cache
+    cache_hit = False
+
     @staticmethod
-    def load():
-        """Loads sprite sheet, basic game map (location of player, hardblocks
-        and places with disabled soft-block and monsters spawning) and main font."""
-        Assets.SPRITE_SHEET = pygame.image.load("sprite_sheet.png").convert()
-        with open("gamemap.txt") as file:
-            Assets.GAMEMAP = [line.rstrip('\n') for line in file]
-        Assets.FONT = pygame.font.Font("PressStart2P-Regular.ttf", 16)
+    def load(use_atlas=True, map_path="gamemap.txt", cache_path=CACHE_PATH):
+        """Loads sprite sheet, game map (location of player, hardblocks
+        and places with disabled soft-block and monsters spawning) and main font.
+        Unless use_atlas is False, every frame of the sprite sheet is sliced up front.
+        The sprite sheet and the fonts are scaled by constants.SCALE.
+
+        The scaled sprite sheet and the parsed map are read from the cache at cache_path, unless
+        the files' hashes have changed, and otherwise baked and written to it (if it's writable).
+        No cache is used if cache_path is None."""
+        sheet_path = get_path("sprite_sheet.png")
+        map_path = get_path(map_path)
+        key = Assets.get_cache_key(sheet_path, map_path)
+        baked = Assets.read_cache(cache_path, key) if cache_path else None
+        Assets.cache_hit = baked is not None
+        if baked is None:
+            baked = Assets.bake(sheet_path, map_path)
+            if cache_path:
+                Assets.write_cache(cache_path, key, baked)
+
+        size, pixels = baked["atlas"]
+        Assets.SPRITE_SHEET = Assets.convert(pygame.image.frombytes(pixels, size, "RGB"))
+        Assets.ROTATED = baked["rotated"]
+        Assets.GAMEMAP = baked["gamemap"]
+        Assets.MAP_INDEX = baked["map_index"]
+        font_path = get_path("PressStart2P-Regular.ttf")
+        Assets.FONT = pygame.font.Font(font_path, 16 * constants.SCALE)
+        Assets.SMALL_FONT = pygame.font.Font(font_path, 8 * constants.SCALE)
+        Assets.GLYPHS = {}
+        for character in "0123456789 -TIMELVS":
+            for color in (constants.WHITE_COLOR, constants.BLACK_COLOR):
+                Assets.get_glyph(character, color)
+        Assets.FRAMES = {}
+        if use_atlas:
+            Assets.build_atlas()
+
+    @staticmethod
+    def bake(sheet_path, map_path):
+        """Decodes and scales the sprite sheet and parses the map. Rotated frames of the blasts
+        are added in rows below the sprite sheet, so that they don't have to be rotated on load."""
+        sprite_sheet = pygame.image.load(sheet_path)
+        if constants.SCALE != 1:
+            # Nearest neighbour, so that the pixel art stays sharp
+            sprite_sheet = pygame.transform.scale(sprite_sheet, (sprite_sheet.get_width() * constants.SCALE,
+                                                                 sprite_sheet.get_height() * constants.SCALE))
+        size = constants.TILE_SIZE
+        columns = sprite_sheet.get_width() // size
+        rows = sprite_sheet.get_height() // size
+        rotations = list(dict.fromkeys((x, y, rotation) for animation in constants.BLAST_ANIMATION
+                                       for (x, y) in animation for rotation in (90, 180, 270)))
+        atlas = pygame.Surface((sprite_sheet.get_width(), (rows + (len(rotations) + columns - 1) // columns) * size))
+        atlas.blit(sprite_sheet, (0, 0))
+        rotated = {}
+        for index, (x, y, rotation) in enumerate(rotations):
+            position = (index % columns, rows + index // columns)
+            frame = sprite_sheet.subsurface((x * size, y * size, size, size))
+            atlas.blit(pygame.transform.rotate(frame, rotation), (position[0] * size, position[1] * size))
+            rotated[(x, y, rotation)] = position
+
+        with open(map_path) as file:
+            gamemap = [line.rstrip('\n') for line in file]
+        return {
+            "atlas": (atlas.get_size(), pygame.image.tobytes(atlas, "RGB")),
+            "rotated": rotated,
+            "gamemap": gamemap,
+            "map_index": levels.MapIndex(gamemap),
+        }
+
+    @staticmethod
+    def get_cache_key(sheet_path, map_path):
+        """Returns hash of everything the baked assets are made of."""
+        key = hashlib.sha1(f"{CACHE_VERSION} {constants.SCALE}".encode())
+        for path in (sheet_path, map_path):
+            with open(path, "rb") as file:
+                key.update(file.read())
+        return key.hexdigest()
+
+    @staticmethod
+    def read_cache(path, key):
+        """Returns the baked assets from the cache, or None if it's missing, out of date or broken.
+        The cache starts with a line holding its key, so that an outdated one isn't unpickled."""
+        try:
+            with open(path, "rb") as file:
+                if file.readline(len(key) + 1) != f"{key}\n".encode():
+                    return None
+                baked = pickle.load(file)
+        except Exception:
+            # Whatever fails to load (e.g. a cache written by a different version) is baked again
+            return None
+        return baked if isinstance(baked, dict) else None
+
+    @staticmethod
+    def write_cache(path, key, baked):
+        """Writes the baked assets to the cache, unless the game's directory is read only."""
+        try:
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(f"{key}\n".encode())
+                pickle.dump(baked, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def build_atlas():
+        """Slices every frame of the sprite sheet and pre-rotates blast frames, so that
+        get_image_at returns shared surfaces instead of allocating new ones."""
+        columns = Assets.SPRITE_SHEET.get_width() // constants.TILE_SIZE
+        # Rows below the sprite sheet's ones hold the rotated frames (see bake)
+        rows = min((y for _, y in Assets.ROTATED.values()),
+                   default=Assets.SPRITE_SHEET.get_height() // constants.TILE_SIZE)
+        for y in range(rows):
+            for x in range(columns):
+                Assets.FRAMES[(x, y, 0)] = Assets.slice_image(x, y)
+        # Blasts are rotated according to their direction (see Blast.update)
+        for animation in constants.BLAST_ANIMATION:
+            for (x, y) in animation:
+                for rotation in (90, 180, 270):
+                    if (x, y, rotation) not in Assets.FRAMES:
+                        Assets.FRAMES[(x, y, rotation)] = Assets.slice_image(x, y, rotation)
 
     # loading images
     @staticmethod
-    def get_image_at(x, y):
-        """Returns image found in sprite sheet at given coordinates."""
+    def get_image_at(x, y, rotation=0):
+        """Returns image found in sprite sheet at given coordinates, rotated by given angle.
+        The returned surface is shared, so it must not be drawn on."""
+        image = Assets.FRAMES.get((x, y, rotation))
+        if image is None:
+            image = Assets.slice_image(x, y, rotation)
+        return image
+
+    @staticmethod
+    def slice_image(x, y, rotation=0):
+        """Returns a new surface with the image found in sprite sheet at given coordinates.
+        The transparent color is RLE accelerated, as the images are only blitted."""
+        if (x, y, rotation) in Assets.ROTATED:
+            # Rotated already when baking
+            x, y = Assets.ROTATED[(x, y, rotation)]
+            rotation = 0
         rectangle = pygame.Rect((
-            x * constants.SPRITE_SIZE,
-            y * constants.SPRITE_SIZE,
-            constants.SPRITE_SIZE,
-            constants.SPRITE_SIZE
+            x * constants.TILE_SIZE,
+            y * constants.TILE_SIZE,
+            constants.TILE_SIZE,
+            constants.TILE_SIZE
         ))
-        image = pygame.Surface(rectangle.size).convert()
-        image.set_colorkey(constants.FIELD_COLOR)
+        image = Assets.convert(pygame.Surface(rectangle.size))
         image.blit(Assets.SPRITE_SHEET, (0, 0), rectangle)
+        Assets.allocations += 1
+        if rotation:
+            image = pygame.transform.rotate(image, rotation)
+            Assets.allocations += 1
+        image.set_colorkey(constants.FIELD_COLOR, pygame.RLEACCEL)
         return image
 
+    @staticmethod
+    def convert(surface):
+        """Converts surface to the pixel format of the window. Without a window (in headless
+        mode) the surface is returned unchanged."""
+        if pygame.display.get_surface() is None:
+            return surface
+        return surface.convert()
+
     @staticmethod
     def get_tiles():
         """Yields gamemap's cells one by one in format (x, y, content). X and Y are coordinates,
@@ -38,3 +206,28 @@ class Assets:
     @staticmethod
     def get_font():
         return Assets.FONT
+
+    @staticmethod
+    def get_small_font():
+        return Assets.SMALL_FONT
+
+    @staticmethod
+    def get_glyph(character, color):
+        """Returns character rendered with the main font in given color on a transparent background.
+        The returned surface is shared, so it must not be drawn on."""
+        glyph = Assets.GLYPHS.get((character, color))
+        if glyph is None:
+            glyph = Assets.convert(Assets.FONT.render(character, True, color, constants.BACKGROUND_COLOR))
+            glyph.set_colorkey(constants.BACKGROUND_COLOR, pygame.RLEACCEL)
+            Assets.GLYPHS[(character, color)] = glyph
+        return glyph
+
+    @staticmethod
+    def get_text_size(string):
+        """Returns size of the string rendered with glyphs (the main font is monospaced)."""
+        width, height = 0, 0
+        for character in string:
+            glyph = Assets.get_glyph(character, constants.WHITE_COLOR)
+            width += glyph.get_width()
+            height = max(height, glyph.get_height())
+        return width, height
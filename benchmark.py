@@ -0,0 +1,174 @@
+"""Benchmarks of the game running without a window.
+
+Measures ticks per second of Game.update, frames per second of Game.draw and latency of
+Game.initialize_level on every level, plus stress scenarios. Results are printed (or saved)
+as JSON and can be compared with results of a previous run to catch regressions."""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import pygame
+
+import assets
+import characters
+import constants
+import controllers
+import main
+import tilegrid
+
+
+def measure(function, repeats):
+    """Calls the function given number of times and returns list of durations in seconds."""
+    durations = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start_time)
+    return durations
+
+
+def summarize(durations):
+    return {
+        "mean_ms": 1000 * statistics.mean(durations),
+        "median_ms": 1000 * statistics.median(durations),
+        "max_ms": 1000 * max(durations),
+        "per_second": len(durations) / sum(durations),
+    }
+
+
+def create_game(level, screen=None, dirty_rects=False, seed=0):
+    game = main.Game(screen, dirty_rects=dirty_rects, seed=seed)
+    game.controller = controllers.RandomController(seed=seed)
+    game.initialize_level(level)
+    return game
+
+
+def benchmark_level(level, screen, ticks):
+    """Measures updating, drawing (in both render modes) and initializing the level."""
+    game = create_game(level)
+    update = summarize(measure(game.update, ticks))
+
+    draw = {}
+    for mode, dirty_rects in (("full", False), ("dirty_rects", True)):
+        game = create_game(level, screen, dirty_rects)
+        durations = []
+        for _ in range(ticks):
+            game.clear()
+            game.update()
+            start_time = time.perf_counter()
+            game.draw()
+            durations.append(time.perf_counter() - start_time)
+        draw[mode] = summarize(durations)
+
+    game = create_game(level)
+    initialize = summarize(measure(lambda: game.initialize_level(level), max(ticks // 20, 5)))
+    return {"update": update, "draw": draw, "initialize_level": initialize}
+
+
+def benchmark_bomb_chain(repeats):
+    """Measures the tick in which 10 bombs with blast range 5 detonate together."""
+    durations = []
+    for seed in range(repeats):
+        game = create_game(1, seed=seed)
+        game.controller = controllers.IdleController()
+        # Clear soft blocks from the corridors, so that the blasts reach as far as possible
+        for (x, y, _) in assets.Assets.get_tiles():
+            if game.grid.get(x, y) & tilegrid.SOFT:
+                game.soft_blocks.destroy((x, y))
+        for _ in range(int(6 / constants.BLOCK_ANIMATION_SPEED) + 1):
+            game.soft_blocks.update(game.animator)
+        for x in range(1, 30, 3):
+            bomb = characters.Bomb((x, 7), 5, game.blasts, game.soft_blocks, game.grid)
+            bomb.timer = 1
+            game.bombs.add(bomb)
+        durations.append(measure(game.update, 1)[0])
+    return summarize(durations)
+
+
+def benchmark_pontans(ticks, pontans=30):
+    """Measures updating the last level with additional Pontans chasing the player."""
+    game = create_game(len(constants.LEVEL_CONTENT_LIST))
+    free_tiles = [(x, y) for (x, y, cell) in assets.Assets.get_tiles() if cell == " " and not game.grid.get(x, y)]
+    for i in range(pontans):
+        monster = characters.get_monster_by_name(constants.Monster.PONTAN, free_tiles[i % len(free_tiles)])
+        game.monsters.add(monster)
+        game.monster_engine.add(monster)
+    return summarize(measure(game.update, ticks))
+
+
+def benchmark_wall_walker(ticks):
+    """Measures updating the game with the player walking through soft blocks."""
+    game = create_game(1)
+    game.player.sprite.wall_walker_bonus = True
+    game.player_copy.wall_walker_bonus = True
+    return summarize(measure(game.update, ticks))
+
+
+def run(ticks):
+    screen = main.initialize_headless(window=True)
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "ticks": ticks,
+        },
+        "levels": {},
+        "stress": {},
+    }
+    for level in range(1, len(constants.LEVEL_CONTENT_LIST) + 1):
+        results["levels"][str(level)] = benchmark_level(level, screen, ticks)
+    results["stress"]["bomb_chain"] = benchmark_bomb_chain(max(ticks // 20, 5))
+    results["stress"]["pontans"] = benchmark_pontans(ticks)
+    results["stress"]["wall_walker"] = benchmark_wall_walker(ticks)
+    pygame.quit()
+    return results
+
+
+def compare(results, baseline, tolerance, path=""):
+    """Returns list of descriptions of the median durations which got worse by more than
+    tolerance (a fraction) compared to the baseline."""
+    regressions = []
+    for key, value in results.items():
+        if key not in baseline or key == "environment":
+            continue
+        if isinstance(value, dict):
+            regressions += compare(value, baseline[key], tolerance, f"{path}{key}.")
+        elif key == "median_ms" and value > baseline[key] * (1 + tolerance):
+            regressions.append(f"{path}{key}: {baseline[key]:.3f} -> {value:.3f}")
+    return regressions
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Bomberman benchmarks")
+    parser.add_argument("--ticks", type=int, default=600,
+                        help="number of ticks (and frames) measured in every scenario")
+    parser.add_argument("--output", metavar="FILE", help="save results into a JSON file")
+    parser.add_argument("--compare", metavar="FILE", help="compare results with a previously saved JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="relative slowdown reported as a regression when comparing")
+    arguments = parser.parse_args()
+
+    results = run(arguments.ticks)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            regressions = compare(results, json.load(file), arguments.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,100 @@
+import math
+
+import numpy
+
+import constants
+import tilegrid
+
+# Channels of the board
+HARD = 0  # 1 where there's a hard block
+SOFT = 1  # 1 where there's a soft block (also one hit by a blast, until it disappears)
+BOMB_TIMER = 2  # ticks left to the explosion of the bomb, -1 for remotely detonated bombs
+BLAST = 3  # number of blasts in the cell
+BONUS = 4  # bonus type + 1 of the revealed bonus
+PLAYER = 5  # 1 where the player is
+MONSTERS = 6  # number of monsters of every type in the cell, one channel per type (see constants.Monster)
+CHANNEL_COUNT = MONSTERS + len(constants.Monster)
+
+
+class Layer:
+    """Sprites of a SpatialGroup shown in the board. Every sprite adds its value to one of the
+    channels in the cell of its center, for as long as it stays in the group."""
+    def __init__(self, board, channel, value=lambda sprite: 1):
+        self.board = board
+        # Channel can depend on the sprite
+        self.channel = channel if callable(channel) else lambda sprite: channel
+        self.value = value
+        self.values = {}
+
+    def add(self, sprite, cell):
+        value = self.value(sprite)
+        self.values[sprite] = value
+        self.board.array[self.channel(sprite), cell[1], cell[0]] += value
+
+    def remove(self, sprite, cell):
+        self.board.array[self.channel(sprite), cell[1], cell[0]] -= self.values.pop(sprite)
+
+    def move(self, sprite, old_cell, cell):
+        self.remove(sprite, old_cell)
+        self.add(sprite, cell)
+
+    def refresh(self, sprite, cell):
+        """Updates the sprite's value, e.g. when it has changed."""
+        self.move(sprite, cell, cell)
+
+
+class Board:
+    """State of the game as an array of shape (CHANNEL_COUNT, map height, map width).
+
+    The array is updated in place only when something changes - the grid's cells (it's
+    notified by the grid), sprites of the layers' groups are added, removed or move to another
+    cell, and bombs tick. So reading the state costs nothing, and view is a read-only array
+    sharing the memory, which can be passed around. The array can be supplied, e.g. in
+    shared memory. It takes CHANNEL_COUNT * 2 bytes per cell, so it's optional on huge maps."""
+    def __init__(self, grid, array=None):
+        self.grid = grid
+        shape = (CHANNEL_COUNT, grid.height, grid.width)
+        if array is None:
+            array = numpy.zeros(shape, dtype=numpy.int16)
+        elif array.shape != shape or array.dtype != numpy.int16:
+            raise ValueError(f"board array has to be int16 of shape {shape}")
+        array.fill(0)
+        self.array = array
+        self.view = array.view()
+        self.view.flags.writeable = False
+        self.cells = numpy.frombuffer(grid.cells, dtype=numpy.uint8).reshape(grid.height, grid.width)
+        self.player_cell = None
+
+        self.blasts = Layer(self, BLAST)
+        self.bonuses = Layer(self, BONUS, lambda bonus: bonus.bonus_type + 1)
+        self.monsters = Layer(self, lambda monster: MONSTERS + monster.kind)
+        self.bombs = Layer(self, BOMB_TIMER, self.get_bomb_timer)
+
+        grid.board = self
+        self.update_cells()
+
+    @staticmethod
+    def get_bomb_timer(bomb):
+        return -1 if bomb.remote else math.ceil(bomb.timer)
+
+    def update_cells(self):
+        """Copies hard and soft blocks from the whole grid."""
+        self.array[HARD] = (self.cells & tilegrid.HARD) != 0
+        self.array[SOFT] = (self.cells & tilegrid.SOFT) != 0
+
+    def update_cell(self, tile):
+        flags = self.grid.get(*tile)
+        self.array[HARD, tile[1], tile[0]] = (flags & tilegrid.HARD) != 0
+        self.array[SOFT, tile[1], tile[0]] = (flags & tilegrid.SOFT) != 0
+
+    def update(self, player, bombs):
+        """Updates things changing every tick - the player's cell and the bombs' timers."""
+        cell = player.get_tile_pos()
+        if cell != self.player_cell:
+            if self.player_cell is not None:
+                self.array[PLAYER, self.player_cell[1], self.player_cell[0]] = 0
+            self.array[PLAYER, cell[1], cell[0]] = 1
+            self.player_cell = cell
+        for bomb in bombs:
+            if not bomb.remote:
+                self.bombs.refresh(bomb, bombs.sprite_cells[bomb])
@@ -1,184 +1,202 @@
-import math
-import random
 import pygame
 
+import animation
 import constants
 import assets
+import explosions
+import kinematics
+import pool
+import spatialhash
+import tilegrid
 
 
-def get_modified_position(coordinates, direction, delta):
-    """Returns modified coordinates by given direction and value"""
-    current_x, current_y = coordinates
-    (new_x, new_y) = {
-        0: lambda x, y: (x - delta, y),  # LEFT
-        1: lambda x, y: (x, y + delta),  # DOWN
-        2: lambda x, y: (x + delta, y),  # RIGHT
-        3: lambda x, y: (x, y - delta),  # UP
-    }[direction](current_x, current_y)
-    return new_x, new_y
-
-
-def spritegrouplistcollide(sprite, grouplist, dokill):
-    collision_list = []
-    for group in grouplist:
-        collided = pygame.sprite.spritecollide(sprite, group, dokill)
-        for item in collided:
-            collision_list.append(item)
-    return collision_list
-
 # Monster factory
-def get_monster_by_name(name, start_pos, player, bombs, soft_blocks, hard_blocks):
+def get_monster_by_name(name, start_pos):
     monster = None
     if name == constants.Monster.BALLOM:
-        monster = Ballom(start_pos, bombs, soft_blocks, hard_blocks)
+        monster = Ballom(start_pos)
     elif name == constants.Monster.ONIL:
-        monster = Onil(start_pos, bombs, soft_blocks, hard_blocks)
+        monster = Onil(start_pos)
     elif name == constants.Monster.DAHL:
-        monster = Dahl(start_pos, bombs, soft_blocks, hard_blocks)
+        monster = Dahl(start_pos)
     elif name == constants.Monster.MINVO:
-        monster = Minvo(start_pos, player, bombs, soft_blocks, hard_blocks)
+        monster = Minvo(start_pos)
     elif name == constants.Monster.DORIA:
-        monster = Doria(start_pos, player, bombs, hard_blocks)
+        monster = Doria(start_pos)
     elif name == constants.Monster.OVAPE:
-        monster = Ovape(start_pos, bombs, hard_blocks)
+        monster = Ovape(start_pos)
     elif name == constants.Monster.TIGLON:
-        monster = Tiglon(start_pos, player, bombs, soft_blocks, hard_blocks)
+        monster = Tiglon(start_pos)
     elif name == constants.Monster.PONTAN:
-        monster = Pontan(start_pos, player, bombs, hard_blocks)
+        monster = Pontan(start_pos)
     if monster is None:
         raise ValueError
     return monster
 
 
 class Blast(pygame.sprite.Sprite):
+    """Part of an explosion. Blasts are taken from BLAST_POOL and go back to it when they end."""
+    __slots__ = ("image", "rect", "clock", "shown", "timer", "direction", "type")
+
     def __init__(self, start_pos, type, direction):
         pygame.sprite.Sprite.__init__(self)
+        self.rect = pygame.Rect(0, 0, constants.SPRITE_SIZE, constants.SPRITE_SIZE)
+        self.reset(start_pos, type, direction)
+
+    def reset(self, start_pos, type, direction):
         self.image = assets.Assets.get_image_at(0, 4 + type)
-        self.rect = self.image.get_rect()
         self.rect.x = start_pos[0] * constants.SPRITE_SIZE
         self.rect.y = start_pos[1] * constants.SPRITE_SIZE
-        self.frame = 0
+        self.clock = animation.Clock(animation.BLAST)
+        self.shown = None
         self.timer = constants.BLAST_TIME
         self.direction = direction
         self.type = type
-        self.collide_rect_ratio = 0.1
 
-    def update(self):
+    def update(self, animator):
         self.timer -= 1
         if self.timer == 0:
             self.kill()
-        # Update image frame
-        self.frame = (self.frame + constants.BLAST_ANIMATION_SPEED) % 7
-        # Update image according to frame
-        image_x, image_y = constants.BLAST_ANIMATION[self.type][int(self.frame)]
-        self.image = pygame.transform.rotate(assets.Assets.get_image_at(image_x, image_y),
-                                             (self.direction + 1) % 4 * 90)
+            BLAST_POOL.release(self)
+            return
+        # Update image only when its frame changes
+        if self.clock.tick() or self.shown is None:
+            animator.show(self, constants.BLAST_ANIMATION[self.type][self.clock.frame],
+                          (self.direction + 1) % 4 * 90)
 
 
 class Bomb(pygame.sprite.Sprite):
-    def __init__(self, start_pos, blast_range, blasts, hard_blocks, soft_blocks, remote=False):
+    """Bomb placed by the player. Bombs are taken from BOMB_POOL and go back to it when they detonate."""
+    __slots__ = ("image", "rect", "shown", "timer", "blasts", "blast_range", "soft_blocks", "grid", "remote")
+
+    def __init__(self, start_pos, blast_range, blasts, soft_blocks, grid, remote=False):
         pygame.sprite.Sprite.__init__(self)
+        self.rect = pygame.Rect(0, 0, constants.SPRITE_SIZE, constants.SPRITE_SIZE)
+        self.reset(start_pos, blast_range, blasts, soft_blocks, grid, remote)
+
+    def reset(self, start_pos, blast_range, blasts, soft_blocks, grid, remote=False):
         self.image = assets.Assets.get_image_at(0, 3)
-        self.rect = self.image.get_rect()
         self.rect.x = start_pos[0] * constants.SPRITE_SIZE
         self.rect.y = start_pos[1] * constants.SPRITE_SIZE
-        self.frame = 0
+        self.shown = None
         self.timer = -1 if remote else constants.BOMB_TIME
         self.blasts = blasts
         self.blast_range = blast_range
-        self.hard_blocks = hard_blocks
         self.soft_blocks = soft_blocks
+        self.grid = grid
         self.remote = remote
+        self.grid.add(start_pos, tilegrid.BOMB)
 
     def kill(self):
-        if self.timer > 5 or self.timer < 0:
-            self.timer = 5
-        if self.timer == 0:
-            self.blasts.add(Blast(self.get_tile_pos(), 2, 0))
-            for direction in constants.Direction:
-                for i in range(self.blast_range):
-                    if i == 0:
-                        continue
-                    x, y = get_modified_position(self.get_tile_pos(), direction, i)
-                    new_blast = Blast((x, y), 1, direction)
-                    if pygame.sprite.spritecollide(new_blast, self.hard_blocks, False):
-                        break
-                    if pygame.sprite.spritecollide(new_blast, self.soft_blocks, True):
-                        break
-                    bombs = self.groups()[0]
-                    pygame.sprite.spritecollide(new_blast, bombs, True)
-                    self.blasts.add(new_blast)
-                else:
-                    x, y = get_modified_position(self.get_tile_pos(), direction, self.blast_range)
-                    new_blast = Blast((x, y), 0, direction)
-                    if pygame.sprite.spritecollide(new_blast, self.hard_blocks, False):
-                        continue
-                    if pygame.sprite.spritecollide(new_blast, self.soft_blocks, True):
-                        continue
-                    bombs = self.groups()[0]
-                    pygame.sprite.spritecollide(new_blast, bombs, True)
-                    self.blasts.add(new_blast)
-
-            pygame.sprite.Sprite.kill(self)
-
-    def update(self):
+        """Detonates the bomb together with every bomb reached by its blasts."""
+        if not self.alive():
+            return
+        blasts, soft_block_cells, detonated = explosions.resolve(self, self.grid, self.groups()[0])
+        for cell, (blast_type, direction) in blasts.items():
+            self.blasts.add(BLAST_POOL.acquire(cell, blast_type, direction))
+        for cell in soft_block_cells:
+            self.soft_blocks.destroy(cell)
+        for bomb in detonated:
+            bomb.grid.remove(bomb.get_tile_pos(), tilegrid.BOMB)
+            pygame.sprite.Sprite.kill(bomb)
+            bomb.release()
+
+    def release(self):
+        # Pooled bombs shouldn't keep the finished level alive
+        self.blasts = self.soft_blocks = self.grid = None
+        BOMB_POOL.release(self)
+
+    def update(self, animator):
         self.timer -= 1
         if self.timer == 0:
             self.kill()
-        # Update image frame
-        self.frame = (self.frame + constants.ANIMATION_SPEED) % 4
-        # Update image according to frame
-        image_x, image_y = constants.BOMB_TICKING_ANIMATION[int(self.frame)]
-        self.image = assets.Assets.get_image_at(image_x, image_y)
+            return
+        # All bombs tick in lockstep
+        clock = animator.get_clock(animation.MOVEMENT)
+        if clock.changed or self.shown is None:
+            animator.show(self, constants.BOMB_TICKING_ANIMATION[clock.frame])
 
     def get_tile_pos(self):
         return self.rect.center[0] // constants.SPRITE_SIZE, self.rect.center[1] // constants.SPRITE_SIZE
 
 
+BLAST_POOL = pool.Pool(Blast)
+BOMB_POOL = pool.Pool(Bomb)
+
+
 class Block(pygame.sprite.Sprite):
+    __slots__ = ("image", "rect")
+
     def __init__(self, image_pos, start_pos):
         pygame.sprite.Sprite.__init__(self)
         self.image = assets.Assets.get_image_at(image_pos[0], image_pos[1])
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, constants.SPRITE_SIZE, constants.SPRITE_SIZE)
         self.rect.x = start_pos[0] * constants.SPRITE_SIZE
         self.rect.y = start_pos[1] * constants.SPRITE_SIZE
 
 
-class HardBlock(Block):
-    def __init__(self, start_pos):
-        super().__init__((3, 3), start_pos)
-
-
 class SoftBlock(Block):
-    def __init__(self, start_pos, bonus_type=-1, bonuses=None):
+    """Soft block hit by a blast, playing its disappearing animation. Its cell is freed
+    (and the bonus hidden under it is revealed) when the animation ends. The grid and
+    the bonuses are the ones of the SoftBlocks group it belongs to."""
+    __slots__ = ("clock", "shown", "bonus_type", "soft_blocks")
+
+    def __init__(self, start_pos, soft_blocks, bonus_type=-1):
         super().__init__((4, 3), start_pos)
-        self.frame = 0
-        self.dead = 0
+        self.clock = animation.Clock(animation.SOFT_BLOCK)
+        self.shown = None
         self.bonus_type = bonus_type
-        self.bonuses = bonuses
+        self.soft_blocks = soft_blocks
 
-    def update(self):
+    def update(self, animator):
         # if self.bonus_type != -1:
         #     self.image = assets.Assets.get_image_at(self.bonus_type, 7)
-        if self.dead:
-            self.frame += constants.BLOCK_ANIMATION_SPEED
-            if int(self.frame) == 6:
-                if self.bonus_type != -1:
-                    self.bonuses.add(Bonus((self.rect.x, self.rect.y), self.bonus_type))
-                pygame.sprite.Sprite.kill(self)
-                return
-            image_x, image_y = constants.SOFT_BLOCK_DISAPPEARING_ANIMATION[int(self.frame)]
-            self.image = assets.Assets.get_image_at(image_x, image_y)
+        self.clock.tick()
+        if self.clock.frame == animation.SOFT_BLOCK.length:
+            if self.bonus_type != -1:
+                self.soft_blocks.bonuses.add(Bonus((self.rect.x, self.rect.y), self.bonus_type))
+            self.soft_blocks.grid.remove(self.get_tile_pos(), tilegrid.SOFT)
+            pygame.sprite.Sprite.kill(self)
+            return
+        if self.clock.changed or self.shown is None:
+            animator.show(self, constants.SOFT_BLOCK_DISAPPEARING_ANIMATION[self.clock.frame])
 
-    def kill(self):
-        self.dead = 1
+    def get_tile_pos(self):
+        return self.rect.x // constants.SPRITE_SIZE, self.rect.y // constants.SPRITE_SIZE
+
+
+class SoftBlocks(spatialhash.SpatialGroup):
+    """Soft blocks of the level. Standing soft blocks are only flags in the grid (and bonuses
+    hidden under them), so that they take no memory as sprites. Sprites are created only for
+    the blocks hit by a blast, which are the group's sprites until they disappear."""
+    def __init__(self, grid, bonuses):
+        super().__init__()
+        self.grid = grid
+        self.bonuses = bonuses
+        self.bonus_types = {}
+
+    def place(self, tile, bonus_type=-1):
+        self.grid.add(tile, tilegrid.SOFT)
+        if bonus_type != -1:
+            self.bonus_types[tile] = bonus_type
+
+    def destroy(self, tile):
+        """Starts the disappearing animation of the soft block at given tile (unless it's already playing)."""
+        if self.is_destroyed(tile):
+            return
+        self.add(SoftBlock(tile, self, self.bonus_types.pop(tile, -1)))
+        # The standing block isn't drawn with the rest of the chunk anymore
+        self.grid.invalidate(tile)
+
+    def is_destroyed(self, tile):
+        return tile in self.buckets
 
 
 class Bonus(pygame.sprite.Sprite):
     def __init__(self, start_pos, bonus_type):
         pygame.sprite.Sprite.__init__(self)
         self.image = assets.Assets.get_image_at(bonus_type, 7)
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, constants.SPRITE_SIZE, constants.SPRITE_SIZE)
         self.rect.x = start_pos[0]
         self.rect.y = start_pos[1]
         self.bonus_type = bonus_type
@@ -189,10 +207,14 @@ class Player(pygame.sprite.Sprite):
     def __init__(self, start_x, start_y):
         pygame.sprite.Sprite.__init__(self)
         self.image = assets.Assets.get_image_at(1, 1)
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, constants.SPRITE_SIZE, constants.SPRITE_SIZE)
         self.rect.x = start_x * constants.SPRITE_SIZE
         self.rect.y = start_y * constants.SPRITE_SIZE
-        self.frame = 1
+        # Sub-pixel position, moved by Game.move_player
+        self.body = kinematics.Body(self.rect)
+        # The player walks only while a key is pressed, so he has his own clock
+        self.clock = animation.Clock(animation.MOVEMENT, 1)
+        self.shown = None
         self.direction = constants.Direction.RIGHT
         self.__speed = constants.BASE_SPEED
         self.__max_bombs = 1
@@ -226,175 +248,111 @@ class Player(pygame.sprite.Sprite):
     def max_bombs(self, max_bombs):
         self.__max_bombs = 10 if max_bombs >= 10 else max_bombs
 
-    def update(self):
+    def update(self, pressed, animator):
         if self.dead:
-            self.frame += constants.ANIMATION_SPEED
-            if int(self.frame) == 7:
+            self.clock.tick()
+            if self.clock.frame == animation.PLAYER_DEATH.length:
                 self.lives -= 1
                 return
-            image_x, image_y = constants.BOMBERMAN_DEATH_ANIMATION[int(self.frame)]
-            self.image = assets.Assets.get_image_at(image_x, image_y)
+            if self.clock.changed or self.shown is None:
+                animator.show(self, constants.BOMBERMAN_DEATH_ANIMATION[self.clock.frame])
         else:
             # Update image direction and frame
-            pressed = pygame.key.get_pressed()
             keys = [pygame.K_LEFT, pygame.K_DOWN, pygame.K_RIGHT, pygame.K_UP]
             for key in keys:
                 if pressed[key]:
                     self.direction = keys.index(key)
-                    self.frame = (self.frame + constants.ANIMATION_SPEED) % 4
+                    self.clock.tick()
                     break  # so that animation's speed isn't doubled
 
-            # Update image according to frame and direction
-            image_x, image_y = constants.BOMBERMAN_MOVEMENT_ANIMATION[self.direction][int(self.frame)]
-            self.image = assets.Assets.get_image_at(image_x, image_y)
+            # Update image according to frame and direction - it's swapped only when one of them changes
+            animator.show(self, constants.BOMBERMAN_MOVEMENT_ANIMATION[self.direction][self.clock.frame])
 
     def kill(self):
         if not self.dead:
             self.dead = 1
-            self.frame = 0
+            self.clock = animation.Clock(animation.PLAYER_DEATH)
+            self.shown = None
+
+    def reset_animation(self):
+        self.clock = animation.Clock(animation.MOVEMENT)
+        self.shown = None
 
     def get_tile_pos(self):
         return self.rect.center[0] // constants.SPRITE_SIZE, self.rect.center[1] // constants.SPRITE_SIZE
 
 
 class Enemy(pygame.sprite.Sprite):
+    """Base class of the monsters. They are moved by the MonsterEngine, which keeps the rect
+    and direction of the sprite up to date, so the sprite only animates itself."""
+    # Type of the monster (see constants.Monster), set by the subclasses
+    kind = None
+
     def __init__(self, start_pos):
         pygame.sprite.Sprite.__init__(self)
         self.image = assets.Assets.get_image_at(0, 0)
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, constants.SPRITE_SIZE, constants.SPRITE_SIZE)
         self.rect.x = start_pos[0] * constants.SPRITE_SIZE
         self.rect.y = start_pos[1] * constants.SPRITE_SIZE
         self.direction = constants.Direction.RIGHT
         self.movement_animation = None
         self.death_animation = None
-        self.obstacles = None
-        self.frame = 0
+        # Clock of the death animation, walking is played by the clock shared by all monsters
+        self.clock = None
+        self.shown = None
+        # Flags of the grid cells that block the movement
+        self.obstacles = 0
         self.speed = 0
+        self.freeze = 0
+        self.turn_ratio = 0
+        self.turn_time = 0
+        # Monsters chase the player within the radius, unless they turn randomly
+        self.chase_radius = 0
+        self.random_turn_chance = 0
         self.dead = 0
+        # Set when added to the MonsterEngine
+        self.engine = None
+        self.index = None
 
-    def update(self):
+    def update(self, animator):
         if self.dead:
-            self.die()
+            self.die(animator)
         else:
-            self.animate()
-            self.move()
+            self.animate(animator)
 
-    def move(self):
-        raise NotImplemented
-
-    def die(self):
-        self.frame += constants.ANIMATION_SPEED
-        if int(self.frame) == 4:
+    def die(self, animator):
+        self.clock.tick()
+        if self.clock.frame == animation.MONSTER_DEATH.length:
             pygame.sprite.Sprite.kill(self)
             return
-        image_x, image_y = self.death_animation[int(self.frame)]
-        self.image = assets.Assets.get_image_at(image_x, image_y)
+        if self.clock.changed or self.shown is None:
+            animator.show(self, self.death_animation[self.clock.frame])
 
-    def animate(self):
-        # Animate
-        self.frame = (self.frame + constants.ANIMATION_SPEED) % 4
-        image_x, image_y = self.movement_animation[self.direction // 2][int(self.frame)]
-        self.image = assets.Assets.get_image_at(image_x, image_y)
+    def animate(self, animator):
+        # The image changes with the shared clock's frame or the direction set by the MonsterEngine
+        clock = animator.get_clock(animation.MOVEMENT)
+        animator.show(self, self.movement_animation[self.direction // 2][clock.frame])
 
     def get_tile_pos(self):
         return self.rect.center[0] // constants.SPRITE_SIZE, self.rect.center[1] // constants.SPRITE_SIZE
 
-    def get_possible_directions(self):
-        possible_directions = []
-        for direction in constants.Direction:
-            self.rect.x, self.rect.y = get_modified_position((self.rect.x, self.rect.y), direction, 1)
-            if not spritegrouplistcollide(self, self.obstacles, False):
-                possible_directions.append(direction)
-            self.rect.x, self.rect.y = get_modified_position((self.rect.x, self.rect.y), direction, -1)
-        return possible_directions
-
     def kill(self):
-        self.frame = 0
+        self.clock = animation.Clock(animation.MONSTER_DEATH)
+        self.shown = None
         self.dead = 1
+        if self.engine is not None:
+            self.engine.deactivate(self.index)
 
 
 class AdvancedEnemy(Enemy):
-    def __init__(self, start_pos, player):
+    """Monster chasing the player when he is within the chase radius."""
+    def __init__(self, start_pos):
         super().__init__(start_pos)
-        self.dead = 0
-        self.freeze = 0
-        self.turn_ratio = 0
-        self.turn_time = 0
-        self.obstacles = None
-        self.chase_radius = 0
-        self.player = player
         self.random_turn_chance = 0.20
 
-    def move(self):
-        possible_directions = self.get_possible_directions()
-        preferred_directions = self.get_preferred_directions()
-        if len(possible_directions) > 0:
-            if self.rect.x % constants.SPRITE_SIZE == 0 and self.rect.y % constants.SPRITE_SIZE == 0:
-                if self.direction not in possible_directions:
-                    for direction in preferred_directions:
-                        if direction in possible_directions:
-                            self.direction = direction
-                            break
-                    self.freeze = self.turn_time
-                elif random.random() < self.turn_ratio:
-                    for direction in preferred_directions:
-                        if direction in possible_directions:
-                            self.direction = direction
-                            break
-            if not self.freeze:
-                self.rect.x, self.rect.y = get_modified_position((self.rect.x, self.rect.y),
-                                                                 self.direction,
-                                                                 self.speed)
-            else:
-                self.freeze -= 1
-
-    def get_preferred_directions(self):
-        dx = self.player.rect.x - self.rect.x
-        dy = self.player.rect.y - self.rect.y
-        directions = [constants.Direction.LEFT, constants.Direction.DOWN,
-                      constants.Direction.RIGHT, constants.Direction.UP]
-        if math.sqrt(dx * dx + dy * dy) > self.chase_radius:
-            return sorted(directions, key=lambda x: random.random())
-        if random.random() < self.random_turn_chance:
-            return sorted(directions, key=lambda x: random.random())
-        rated_directions = [
-            (constants.Direction.LEFT, dx),
-            (constants.Direction.DOWN, -dy),
-            (constants.Direction.RIGHT, -dx),
-            (constants.Direction.UP, dy),
-        ]
-        rated_directions = sorted(rated_directions, key=lambda x: x[1])
-        directions = []
-        for direction, _ in rated_directions:
-            directions.append(direction)
-        return directions
-
 
 class SimpleEnemy(Enemy):
-    def __init__(self, start_pos):
-        super().__init__(start_pos)
-        self.dead = 0
-        self.freeze = 0
-        self.turn_ratio = 0
-        self.turn_time = 0
-        self.obstacles = None
-
-    def move(self):
-        possible_directions = self.get_possible_directions()
-        if len(possible_directions) > 0:
-            if self.rect.x % constants.SPRITE_SIZE == 0 and self.rect.y % constants.SPRITE_SIZE == 0:
-                if self.direction not in possible_directions:
-                    self.direction = sorted(possible_directions, key=lambda x: random.random())[0]
-                    self.freeze = self.turn_time
-                elif random.random() < self.turn_ratio:
-                    self.direction = sorted(possible_directions, key=lambda x: random.random())[0]
-            if not self.freeze:
-                self.rect.x, self.rect.y = get_modified_position((self.rect.x, self.rect.y),
-                                                                 self.direction,
-                                                                 self.speed)
-            else:
-                self.freeze -= 1
-
+    """Monster moving randomly."""
 
 
 class Ballom(SimpleEnemy):
@@ -402,7 +360,9 @@ class Ballom(SimpleEnemy):
 
     Ballom has a very unpredictable movement pattern. They are slow and won't chase after
     Bomberman, but they turn or reverse direction upon colliding with a wall or bomb."""
-    def __init__(self, start_pos, bombs, soft_blocks, hard_blocks):
+    kind = constants.Monster.BALLOM
+
+    def __init__(self, start_pos):
         super().__init__(start_pos)
         self.speed = constants.BASE_SPEED * 0.5
         self.turn_ratio = 0.05
@@ -410,7 +370,7 @@ class Ballom(SimpleEnemy):
         self.movement_animation = constants.BALLOOM_MOVEMENT_ANIMATION
         self.death_animation = constants.BALLOOM_DEATH_ANIMATION
         self.points = 100
-        self.obstacles = [bombs, soft_blocks, hard_blocks]
+        self.obstacles = tilegrid.BOMB | tilegrid.SOFT | tilegrid.HARD
 
 
 class Onil(SimpleEnemy):
@@ -418,7 +378,9 @@ class Onil(SimpleEnemy):
 
     Onil moves quickly and randomly. They will move towards Bomberman when he is nearby. They
     are not likely to get stuck on walls and can be incredibly troublesome."""
-    def __init__(self, start_pos, bombs, soft_blocks, hard_blocks):
+    kind = constants.Monster.ONIL
+
+    def __init__(self, start_pos):
         super().__init__(start_pos)
         self.speed = constants.BASE_SPEED
         self.turn_ratio = 0.15
@@ -426,7 +388,7 @@ class Onil(SimpleEnemy):
         self.movement_animation = constants.ONIL_MOVEMENT_ANIMATION
         self.death_animation = constants.ONIL_DEATH_ANIMATION
         self.points = 200
-        self.obstacles = [bombs, soft_blocks, hard_blocks]
+        self.obstacles = tilegrid.BOMB | tilegrid.SOFT | tilegrid.HARD
 
 
 class Dahl(SimpleEnemy):
@@ -436,7 +398,9 @@ class Dahl(SimpleEnemy):
     not hard to kill since they are not smart, even less intelligent than Balloms and won't
     try to chase Bomberman. They prefer to move from left to right, sometimes switching to up
     and down. Commonly get stuck in walls."""
-    def __init__(self, start_pos, bombs, soft_blocks, hard_blocks):
+    kind = constants.Monster.DAHL
+
+    def __init__(self, start_pos):
         super().__init__(start_pos)
         self.speed = constants.BASE_SPEED
         self.turn_ratio = 0.10
@@ -444,7 +408,7 @@ class Dahl(SimpleEnemy):
         self.movement_animation = constants.DAHL_MOVEMENT_ANIMATION
         self.death_animation = constants.DAHL_DEATH_ANIMATION
         self.points = 400
-        self.obstacles = [bombs, soft_blocks, hard_blocks]
+        self.obstacles = tilegrid.BOMB | tilegrid.SOFT | tilegrid.HARD
 
 
 class Minvo(AdvancedEnemy):
@@ -452,15 +416,17 @@ class Minvo(AdvancedEnemy):
 
     They move as fast as Onils. Encountered after the Dahls. They will pursue Bomberman if he's
     nearby, but commonly get stuck if he's hiding."""
-    def __init__(self, start_pos, player, bombs, soft_blocks, hard_blocks):
-        super().__init__(start_pos, player)
+    kind = constants.Monster.MINVO
+
+    def __init__(self, start_pos):
+        super().__init__(start_pos)
         self.speed = constants.BASE_SPEED
         self.turn_ratio = 0.20
         self.turn_time = 0
         self.movement_animation = constants.MINVO_MOVEMENT_ANIMATION
         self.death_animation = constants.MINVO_DEATH_ANIMATION
         self.points = 800
-        self.obstacles = [bombs, soft_blocks, hard_blocks]
+        self.obstacles = tilegrid.BOMB | tilegrid.SOFT | tilegrid.HARD
         self.chase_radius = 6 * constants.SPRITE_SIZE
         self.random_turn_chance = 0.25
 
@@ -471,15 +437,17 @@ class Doria(AdvancedEnemy):
     It moves really slow, but it can move through Soft Blocks. It appears cyan-colored, just as
     the Onils are. Dorias are very smart, they will commonly attempt to chase Bomberman and they
     can evade bombs."""
-    def __init__(self, start_pos, player, bombs, hard_blocks):
-        super().__init__(start_pos, player)
+    kind = constants.Monster.DORIA
+
+    def __init__(self, start_pos):
+        super().__init__(start_pos)
         self.speed = constants.BASE_SPEED * 0.5
         self.turn_ratio = 0.50
         self.turn_time = 5
         self.movement_animation = constants.DORIA_MOVEMENT_ANIMATION
         self.death_animation = constants.DORIA_DEATH_ANIMATION
         self.points = 1000
-        self.obstacles = [bombs, hard_blocks]
+        self.obstacles = tilegrid.BOMB | tilegrid.HARD
         self.chase_radius = 12 * constants.SPRITE_SIZE
         self.random_turn_chance = 0.30
 
@@ -490,16 +458,17 @@ class Ovape(SimpleEnemy):
     They resemble red, purple or pink ghosts that move through Soft Blocks. They are encountered
     after the Dorias They don't chase after Bomberman too commonly, unlike Dorias, but due to
     their wall-pass abilities, they can cause problems."""
-    def __init__(self, start_pos, bombs, hard_blocks):
+    kind = constants.Monster.OVAPE
+
+    def __init__(self, start_pos):
         super().__init__(start_pos)
-        # TODO: implement fraction speeds - 0.75 for Ovape
-        self.speed = constants.BASE_SPEED
+        self.speed = constants.BASE_SPEED * 0.75
         self.turn_ratio = 0.10
         self.turn_time = 5
         self.movement_animation = constants.OVAPE_MOVEMENT_ANIMATION
         self.death_animation = constants.OVAPE_DEATH_ANIMATION
         self.points = 2000
-        self.obstacles = [bombs, hard_blocks]
+        self.obstacles = tilegrid.BOMB | tilegrid.HARD
 
 
 class Tiglon(AdvancedEnemy):
@@ -510,15 +479,17 @@ class Tiglon(AdvancedEnemy):
     a bit faster and smarter. They're associated with the Fireproof Power-up and as such, will
     appear if said power up is blown up by a bomb, or the exit of a level with this power up
     present is bombed."""
-    def __init__(self, start_pos, player, bombs, soft_blocks, hard_blocks):
-        super().__init__(start_pos, player)
+    kind = constants.Monster.TIGLON
+
+    def __init__(self, start_pos):
+        super().__init__(start_pos)
         self.speed = constants.BASE_SPEED
         self.turn_ratio = 0.35
         self.turn_time = 0
         self.movement_animation = constants.TIGLON_MOVEMENT_ANIMATION
         self.death_animation = constants.TIGLON_DEATH_ANIMATION
         self.points = 4000
-        self.obstacles = [bombs, soft_blocks, hard_blocks]
+        self.obstacles = tilegrid.BOMB | tilegrid.SOFT | tilegrid.HARD
         self.chase_radius = 12 * constants.SPRITE_SIZE
         self.random_turn_chance = 0.15
 
@@ -530,15 +501,17 @@ class Pontan(AdvancedEnemy):
     They're associated with the Invincibility Power-up and as such, will appear if said power up
     is blown up by a bomb, or the exit of a level with this power up present is bombed or if the
     timer reaches zero. They are able to chase the player from one side of the screen to the other."""
-    def __init__(self, start_pos, player, bombs, hard_blocks):
-        super().__init__(start_pos, player)
+    kind = constants.Monster.PONTAN
+
+    def __init__(self, start_pos):
+        super().__init__(start_pos)
         self.speed = constants.BASE_SPEED * 2
         self.turn_ratio = 0.6
         self.turn_time = 0
         self.movement_animation = constants.PONTAN_MOVEMENT_ANIMATION
         self.death_animation = constants.PONTAN_DEATH_ANIMATION
         self.points = 8000
-        self.obstacles = [bombs, hard_blocks]
+        self.obstacles = tilegrid.BOMB | tilegrid.HARD
         self.chase_radius = 30 * constants.SPRITE_SIZE
         self.random_turn_chance = 0.2
 
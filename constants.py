@@ -2,17 +2,22 @@ import enum
 
 TICK_RATE = 60
 TICK_TIME_MS = 1000 / TICK_RATE
+# How many frames in a row can be skipped (not drawn) when the game can't keep up with the tick rate
+MAX_FRAME_SKIP = 5
 
 BACKGROUND_COLOR = (200, 200, 200)
 WHITE_COLOR = (255, 255, 255)
 BLACK_COLOR = (0, 0, 0)
 FIELD_COLOR = (56, 135, 0)
 
+# Size of a cell in the sprite sheet and in the field, which is simulated in pixels of the sprite sheet
 SPRITE_SIZE = 32
-WINDOW_WIDTH, WINDOW_HEIGHT = 16 * SPRITE_SIZE, 15 * SPRITE_SIZE
-FIELD_WIDTH, FIELD_HEIGHT = 31 * SPRITE_SIZE, 13 * SPRITE_SIZE
+# Window pixels per pixel of the sprite sheet (see set_scale) and size of a cell in the window
+SCALE = 1
+TILE_SIZE = SPRITE_SIZE * SCALE
+WINDOW_WIDTH, WINDOW_HEIGHT = 16 * TILE_SIZE, 15 * TILE_SIZE
 
-BASE_SPEED = 2  # must be a divisor of SPRITE_SIZE
+BASE_SPEED = 2  # pixels per tick, fractions of it are kept by kinematics
 ANIMATION_SPEED = 0.1
 
 BOMB_TIME = TICK_RATE * 2.5
@@ -187,3 +192,13 @@ LEVEL_CONTENT_LIST = [
     ([0, 0, 0, 0, 2, 1, 6, 1], 6),  # 49
     ([0, 0, 0, 0, 2, 1, 5, 2], 7),  # 50
 ]
+
+
+def set_scale(scale):
+    """Scales the window by an integer factor. It has to be set before the assets are loaded,
+    as the sprite sheet and the fonts are scaled once when loading, so that drawing a frame
+    takes the same blits at any scale."""
+    global SCALE, TILE_SIZE, WINDOW_WIDTH, WINDOW_HEIGHT
+    SCALE = scale
+    TILE_SIZE = SPRITE_SIZE * scale
+    WINDOW_WIDTH, WINDOW_HEIGHT = 16 * TILE_SIZE, 15 * TILE_SIZE
@@ -0,0 +1,90 @@
+import collections
+import random
+import time
+
+import pygame
+
+ARROW_KEYS = [pygame.K_LEFT, pygame.K_DOWN, pygame.K_RIGHT, pygame.K_UP]
+
+
+class PressedKeys:
+    """Set of pressed keys which can be indexed by key like the result of pygame.key.get_pressed()."""
+    def __init__(self, keys=()):
+        self.keys = frozenset(keys)
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+
+class InputSnapshot(collections.namedtuple("InputSnapshot", ["pressed", "events", "event_times"])):
+    """Input of one tick - pressed keys, events and the times (in seconds of time.perf_counter)
+    at which the events were received, which are None if they aren't known (e.g. generated input).
+
+    It's polled once at the start of the tick and shared by everything reading input during
+    the tick, so it can't be changed."""
+    __slots__ = ()
+
+    def __new__(cls, pressed, events=(), event_times=None):
+        events = tuple(events)
+        event_times = tuple(event_times) if event_times is not None else (None,) * len(events)
+        return super().__new__(cls, pressed, events, event_times)
+
+
+# Input without any pressed key or event
+NO_INPUT = InputSnapshot(PressedKeys())
+
+
+class IdleController:
+    """Supplies no input at all."""
+    def poll(self):
+        """Returns input of the current tick."""
+        return NO_INPUT
+
+
+class KeyboardController:
+    """Supplies input from the keyboard and events from the window.
+
+    Events can be collected before the tick (see collect), e.g. while waiting for it, so that
+    they're timestamped as close to their arrival as possible."""
+    def __init__(self):
+        self.events = []
+        self.event_times = []
+
+    def collect(self):
+        """Takes the events waiting in the queue."""
+        events = pygame.event.get()
+        if events:
+            now = time.perf_counter()
+            self.events += events
+            self.event_times += [now] * len(events)
+
+    def poll(self):
+        """Returns input of the current tick."""
+        self.collect()
+        snapshot = InputSnapshot(pygame.key.get_pressed(), self.events, self.event_times)
+        self.events = []
+        self.event_times = []
+        return snapshot
+
+
+class RandomController:
+    """Supplies random input - walking in random directions and placing and detonating bombs.
+    Doesn't need a window, so it's used for simulating games without a player."""
+    def __init__(self, seed=None, hold_ticks=20):
+        self.random = random.Random(seed)
+        self.hold_ticks = hold_ticks
+        self.ticks = 0
+        self.pressed = PressedKeys()
+
+    def poll(self):
+        """Returns input of the current tick."""
+        events = []
+        if self.ticks % self.hold_ticks == 0:
+            keys = [self.random.choice(ARROW_KEYS)]
+            if self.random.random() < 0.2:
+                keys.append(pygame.K_SPACE)
+            if self.random.random() < 0.1:
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_LCTRL))
+            self.pressed = PressedKeys(keys)
+        self.ticks += 1
+        return InputSnapshot(self.pressed, events)
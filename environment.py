@@ -0,0 +1,256 @@
+"""Environment API for training agents against the game, without a window.
+
+BombermanEnv runs one game, VectorEnv runs many of them in worker processes, exchanging actions,
+observations, rewards and other results through shared memory, so that they are never pickled."""
+import argparse
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy
+import pygame
+
+import assets
+import boardstate
+import controllers
+import main
+import multimatch
+
+# Actions of the agent
+NOOP, LEFT, DOWN, RIGHT, UP, BOMB, DETONATE = range(7)
+ACTION_COUNT = 7
+ACTION_KEYS = {
+    LEFT: pygame.K_LEFT,
+    DOWN: pygame.K_DOWN,
+    RIGHT: pygame.K_RIGHT,
+    UP: pygame.K_UP,
+    BOMB: pygame.K_SPACE,
+}
+
+# Input of every action, built once as it's never changed by the game
+ACTION_INPUTS = {action: controllers.InputSnapshot(controllers.PressedKeys([key]))
+                 for action, key in ACTION_KEYS.items()}
+ACTION_INPUTS[NOOP] = controllers.NO_INPUT
+ACTION_INPUTS[DETONATE] = controllers.InputSnapshot(controllers.PressedKeys(),
+                                                    [pygame.event.Event(pygame.KEYDOWN, key=pygame.K_LCTRL)])
+
+# Values of info (see BombermanEnv.get_info), stored as one row of integers per game in VectorEnv
+INFO_KEYS = ("score", "level", "lives", "ticks")
+
+loaded_map_path = None
+
+
+def initialize(map_path="gamemap.txt"):
+    """Initializes pygame without a window and loads the assets, once per process."""
+    global loaded_map_path
+    if loaded_map_path == map_path:
+        return
+    main.initialize_headless(map_path)
+    loaded_map_path = map_path
+
+
+class ActionController:
+    """Supplies input of the action chosen by the agent."""
+    def __init__(self):
+        self.action = NOOP
+
+    def poll(self):
+        """Returns input of the current tick."""
+        return ACTION_INPUTS.get(self.action, ACTION_INPUTS[NOOP])
+
+
+class BombermanEnv:
+    """Game played by an agent one tick at a time.
+
+    Observation is the game's board (see boardstate.Board), kept up to date by the game itself
+    in the observation array, which can be supplied (e.g. in shared memory) and is overwritten by
+    every step. Reward is the change of the score. Episode is done when the player dies or after
+    max_ticks ticks (if given).
+
+    The game can be one of the games of a multimatch.MultiMatch (with given index), which are
+    updated together - then the step is split into setting the action (see act), updating
+    the MultiMatch and finishing the step (see end_step)."""
+    def __init__(self, map_path="gamemap.txt", max_ticks=None, observation=None, matches=None, index=0):
+        initialize(map_path)
+        self.max_ticks = max_ticks
+        self.matches = matches
+        self.index = index
+        self.controller = ActionController()
+        self.game = None
+        self.ticks = 0
+        self.score = 0
+        # Width and height of the map don't depend on the game
+        map_index = assets.Assets.MAP_INDEX
+        self.observation_shape = (boardstate.CHANNEL_COUNT, map_index.height, map_index.width)
+        self.observation = observation if observation is not None else numpy.zeros(self.observation_shape,
+                                                                                    dtype=numpy.int16)
+
+    def reset(self, seed=None, level=1):
+        """Starts a new game on given level and returns the first observation."""
+        if self.matches is not None:
+            self.game = self.matches.start(self.index, self.controller, seed, level, self.observation)
+        else:
+            self.game = main.Game(None, controller=self.controller, seed=seed, board=True,
+                                  board_array=self.observation)
+            self.game.level = level
+            self.game.initialize_level(level)
+        self.controller.action = NOOP
+        self.ticks = 0
+        self.score = self.game.score
+        return self.game.board.view
+
+    def step(self, action):
+        """Runs one tick with given action. Returns observation, reward, done and info."""
+        self.act(action)
+        self.game.update()
+        return self.end_step()
+
+    def act(self, action):
+        self.controller.action = action
+
+    def end_step(self):
+        """Returns observation, reward, done and info after the game was updated."""
+        self.ticks += 1
+        reward = self.game.score - self.score
+        self.score = self.game.score
+        done = self.game.player.sprite.dead == 1 or (self.max_ticks is not None and self.ticks >= self.max_ticks)
+        return self.game.board.view, reward, done, self.get_info()
+
+    def get_info(self):
+        return {"score": self.game.score, "level": self.game.level,
+                "lives": self.game.player.sprite.lives, "ticks": self.ticks}
+
+
+def run_worker(connection, shared_names, env_count, observation_shape, env_offset, count, map_path, max_ticks):
+    """Runs count environments (starting with env_offset) of a VectorEnv in a worker process."""
+    buffers = [shared_memory.SharedMemory(name=name) for name in shared_names]
+    try:
+        observations, actions, rewards, dones, infos = VectorEnv.get_arrays(buffers, env_count, observation_shape)
+        # Games of the worker are updated together
+        matches = multimatch.MultiMatch(count)
+        environments = [BombermanEnv(map_path, max_ticks, observations[env_offset + i], matches, i)
+                        for i in range(count)]
+        while True:
+            command, argument = connection.recv()
+            if command == "reset":
+                seeds, level = argument
+                for i, env in enumerate(environments):
+                    env.reset(seeds[env_offset + i], level)
+                    infos[env_offset + i] = [env.get_info()[key] for key in INFO_KEYS]
+            elif command == "step":
+                # Finished games are restarted right away (with seeds coming from the finished
+                # ones, so that the games stay reproducible) and their last observation is overwritten
+                for i, env in enumerate(environments):
+                    env.act(actions[env_offset + i])
+                matches.update()
+                for i, env in enumerate(environments):
+                    index = env_offset + i
+                    _, rewards[index], dones[index], info = env.end_step()
+                    infos[index] = [info[key] for key in INFO_KEYS]
+                    if dones[index]:
+                        env.reset(int(env.game.random.randint(1 << 31)), argument)
+            elif command == "close":
+                break
+            connection.send(None)
+    finally:
+        for buffer in buffers:
+            buffer.close()
+
+
+class VectorEnv:
+    """Many games stepped together, spread over worker processes.
+
+    Actions, observations, rewards, dones and infos are arrays (one row per game) in shared
+    memory, so only short commands are sent to the workers. Games which are done are reset
+    automatically (on level given to reset). Returned arrays are overwritten by the next step."""
+    def __init__(self, env_count, workers=None, map_path="gamemap.txt", max_ticks=None):
+        initialize(map_path)
+        self.env_count = env_count
+        self.observation_shape = BombermanEnv(map_path).observation_shape
+        self.level = 1
+        sizes = [2 * env_count * numpy.prod(self.observation_shape), env_count, 8 * env_count, env_count,
+                 8 * env_count * len(INFO_KEYS)]
+        self.buffers = [shared_memory.SharedMemory(create=True, size=int(size)) for size in sizes]
+        self.observations, self.actions, self.rewards, self.dones, self.infos = self.get_arrays(
+            self.buffers, env_count, self.observation_shape)
+
+        workers = min(workers or os.cpu_count() or 1, env_count)
+        self.connections = []
+        self.processes = []
+        for worker in range(workers):
+            offset = env_count * worker // workers
+            count = env_count * (worker + 1) // workers - offset
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_worker, daemon=True,
+                                              args=(worker_connection, [buffer.name for buffer in self.buffers],
+                                                    env_count, self.observation_shape, offset, count,
+                                                    map_path, max_ticks))
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    @staticmethod
+    def get_arrays(buffers, env_count, observation_shape):
+        """Returns arrays of the shared buffers - observations, actions, rewards, dones and infos."""
+        return (numpy.ndarray((env_count,) + tuple(observation_shape), dtype=numpy.int16, buffer=buffers[0].buf),
+                numpy.ndarray(env_count, dtype=numpy.int8, buffer=buffers[1].buf),
+                numpy.ndarray(env_count, dtype=numpy.float64, buffer=buffers[2].buf),
+                numpy.ndarray(env_count, dtype=bool, buffer=buffers[3].buf),
+                numpy.ndarray((env_count, len(INFO_KEYS)), dtype=numpy.int64, buffer=buffers[4].buf))
+
+    def run(self, command, argument=None):
+        for connection in self.connections:
+            connection.send((command, argument))
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self, seeds=None, level=1):
+        """Starts new games (with given list of seeds, random by default) and returns observations."""
+        self.level = level
+        self.run("reset", (list(seeds) if seeds is not None else [None] * self.env_count, level))
+        return self.observations
+
+    def step(self, actions):
+        """Runs one tick of every game. Returns observations, rewards, dones and infos."""
+        self.actions[:] = actions
+        self.run("step", self.level)
+        return self.observations, self.rewards, self.dones, self.infos
+
+    def get_info(self, index):
+        return dict(zip(INFO_KEYS, self.infos[index].tolist()))
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close", None))
+        for process in self.processes:
+            process.join()
+        # Arrays have to be released before the memory they use
+        self.observations = self.actions = self.rewards = self.dones = self.infos = None
+        for buffer in self.buffers:
+            buffer.close()
+            buffer.unlink()
+
+
+def main_environment():
+    parser = argparse.ArgumentParser(description="Bomberman environment throughput")
+    parser.add_argument("--envs", type=int, default=os.cpu_count(), help="number of games stepped together")
+    parser.add_argument("--workers", type=int, help="number of worker processes (one per core by default)")
+    parser.add_argument("--steps", type=int, default=2000, help="number of steps of every game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the next ones get the next seeds")
+    arguments = parser.parse_args()
+
+    random = numpy.random.RandomState(arguments.seed)
+    env = VectorEnv(arguments.envs, arguments.workers)
+    env.reset(range(arguments.seed, arguments.seed + arguments.envs))
+    start_time = time.perf_counter()
+    for _ in range(arguments.steps):
+        env.step(random.randint(ACTION_COUNT, size=arguments.envs))
+    elapsed = time.perf_counter() - start_time
+    env.close()
+    steps = arguments.steps * arguments.envs
+    print(f"{steps} steps in {elapsed:.2f} s ({steps / elapsed:.0f} steps per second)")
+
+
+if __name__ == '__main__':
+    main_environment()
@@ -0,0 +1,52 @@
+import collections
+
+import constants
+import tilegrid
+
+# Blast types - indexes of constants.BLAST_ANIMATION
+END = 0
+MIDDLE = 1
+CENTER = 2
+
+# Change of the cell coordinates for every direction - LEFT, DOWN, RIGHT, UP
+DELTAS = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+
+
+def resolve(bomb, grid, bombs):
+    """Resolves explosion of the bomb, including the chain reaction of every bomb reached by
+    the blasts, in one pass over the grid.
+
+    Blasts go from every bomb in four directions up to its blast range. They are stopped by hard
+    blocks, and by soft blocks, which are destroyed. Returns a tuple of:
+    - dict of cells covered by blasts in format {(x, y): (blast_type, direction)},
+    - set of cells with soft blocks reached by the blasts,
+    - list of detonated bombs."""
+    bombs_by_cell = {other.get_tile_pos(): other for other in bombs}
+    detonated = [bomb]
+    queue = collections.deque(detonated)
+    blasts = {}
+    soft_blocks = set()
+
+    while queue:
+        bomb = queue.popleft()
+        start_x, start_y = bomb.get_tile_pos()
+        blasts[(start_x, start_y)] = (CENTER, 0)
+        for direction, (delta_x, delta_y) in zip(constants.Direction, DELTAS):
+            for distance in range(1, bomb.blast_range + 1):
+                cell = (start_x + delta_x * distance, start_y + delta_y * distance)
+                flags = grid.get(*cell)
+                if flags & tilegrid.HARD:
+                    break
+                if flags & tilegrid.SOFT:
+                    soft_blocks.add(cell)
+                    break
+                if flags & tilegrid.BOMB:
+                    other = bombs_by_cell.get(cell)
+                    if other is not None and other not in detonated:
+                        detonated.append(other)
+                        queue.append(other)
+                blast_type = END if distance == bomb.blast_range else MIDDLE
+                # Where blasts overlap, the center is shown over the middle part over the end
+                if blasts.get(cell, (-1, 0))[0] < blast_type:
+                    blasts[cell] = (blast_type, direction)
+    return blasts, soft_blocks, detonated
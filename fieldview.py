@@ -0,0 +1,93 @@
+import collections
+
+import pygame
+
+import assets
+import constants
+import tilegrid
+
+
+class FieldView:
+    """Draws the part of the field seen through the viewport (a rect of the screen).
+
+    Hard blocks and standing soft blocks exist only in the grid. They're drawn from images of
+    the grid's chunks, which are rendered when a chunk comes into view or changes. Only the
+    recently seen chunks are kept, so memory and frame time depend on the size of the viewport
+    instead of the size of the map. Camera is the field position seen in the viewport's corner.
+
+    The field is simulated in pixels of the sprite sheet, while the screen is scaled by
+    constants.SCALE. Images of the chunks and the sprites are scaled already (see Assets.load),
+    so only positions are scaled when drawing."""
+    def __init__(self, grid, rect, max_chunks=32):
+        self.grid = grid
+        self.rect = rect
+        self.max_chunks = max_chunks
+        # Chunk images with versions of the chunks they were rendered at, the recently used last
+        self.chunks = collections.OrderedDict()
+
+    def get_field_rect(self, screen_rect, camera):
+        """Returns the part of the field seen in given rect of the screen (in the field's pixels)."""
+        scale = constants.SCALE
+        left = camera[0] + (screen_rect.left - self.rect.x) // scale
+        top = camera[1] + (screen_rect.top - self.rect.y) // scale
+        right = camera[0] - (self.rect.x - screen_rect.right) // scale
+        bottom = camera[1] - (self.rect.y - screen_rect.bottom) // scale
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def get_chunk_image(self, chunk, soft_blocks):
+        version = self.grid.get_chunk_version(chunk)
+        cached = self.chunks.get(chunk)
+        if cached is not None and cached[0] == version:
+            self.chunks.move_to_end(chunk)
+            return cached[1]
+
+        size = constants.TILE_SIZE
+        cells = self.grid.get_chunk_rect(chunk)
+        image = cached[1] if cached is not None else assets.Assets.convert(pygame.Surface((cells.width * size,
+                                                                                           cells.height * size)))
+        image.fill(constants.FIELD_COLOR)
+        hard_block = assets.Assets.get_image_at(3, 3)
+        soft_block = assets.Assets.get_image_at(4, 3)
+        for y in range(cells.top, cells.bottom):
+            for x in range(cells.left, cells.right):
+                flags = self.grid.get(x, y)
+                position = ((x - cells.left) * size, (y - cells.top) * size)
+                if flags & tilegrid.HARD:
+                    image.blit(hard_block, position)
+                # Soft blocks hit by a blast are drawn as sprites
+                elif flags & tilegrid.SOFT and not soft_blocks.is_destroyed((x, y)):
+                    image.blit(soft_block, position)
+
+        self.chunks[chunk] = (version, image)
+        self.chunks.move_to_end(chunk)
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return image
+
+    def draw_background(self, screen, camera, screen_rect, soft_blocks):
+        """Draws the field without sprites in given rect of the screen."""
+        # Everything is in the screen's pixels here, as the images of the chunks are scaled
+        camera = (camera[0] * constants.SCALE, camera[1] * constants.SCALE)
+        field_rect = screen_rect.clip(self.rect).move(camera[0] - self.rect.x, camera[1] - self.rect.y)
+        chunk_size = tilegrid.CHUNK_SIZE * constants.TILE_SIZE
+        for chunk_y in range(max(field_rect.top // chunk_size, 0),
+                             min((field_rect.bottom - 1) // chunk_size + 1, self.grid.chunks_height)):
+            for chunk_x in range(max(field_rect.left // chunk_size, 0),
+                                 min((field_rect.right - 1) // chunk_size + 1, self.grid.chunks_width)):
+                image = self.get_chunk_image((chunk_x, chunk_y), soft_blocks)
+                chunk_rect = image.get_rect(topleft=(chunk_x * chunk_size, chunk_y * chunk_size))
+                area = field_rect.clip(chunk_rect)
+                screen.blit(image,
+                            (area.x - camera[0] + self.rect.x, area.y - camera[1] + self.rect.y),
+                            area.move(-chunk_rect.x, -chunk_rect.y))
+
+    def draw_sprites(self, screen, camera, sprites):
+        """Draws the sprites (which should be the ones overlapping the viewport) and returns
+        list of the changed screen rects."""
+        scale = constants.SCALE
+        offset_x, offset_y = self.rect.x - camera[0] * scale, self.rect.y - camera[1] * scale
+        screen.set_clip(self.rect)
+        drawn_rects = [screen.blit(sprite.image, (sprite.rect.x * scale + offset_x, sprite.rect.y * scale + offset_y))
+                       for sprite in sprites]
+        screen.set_clip(None)
+        return drawn_rects
@@ -0,0 +1,63 @@
+import numpy
+
+# Distance of the cells which can't be reached from the target
+UNREACHABLE = 1 << 20
+
+
+class FlowField:
+    """Distances (in steps between cells) from the target cell to the cells around it, which
+    can be reached without passing through any of the obstacle flags.
+
+    Computed with BFS only when the target cell or the grid changes, so all monsters chasing
+    the player share it and read it at no cost. Distances are computed up to max_distance,
+    further cells are unreachable - so they're stored only for the square of cells around
+    the target, no matter how big the map is. The map has to be surrounded by hard blocks."""
+    def __init__(self, grid, obstacles, max_distance):
+        self.grid = grid
+        self.obstacles = obstacles
+        self.max_distance = max_distance
+        self.size = 2 * max_distance + 1
+        # Distances of the cells in the square, row by row, starting from the origin cell
+        self.distances = numpy.full(self.size * self.size, UNREACHABLE, dtype=numpy.int32)
+        self.origin = (0, 0)
+        self.visited = numpy.zeros(0, dtype=numpy.intp)
+        self.target = None
+        self.version = None
+
+    def get_distances(self, cells):
+        """Returns distances of the cells given as an array of indexes of grid.cells."""
+        width = self.grid.width
+        x = cells % width - self.origin[0]
+        y = cells // width - self.origin[1]
+        inside = (x >= 0) & (x < self.size) & (y >= 0) & (y < self.size)
+        indexes = numpy.clip(y, 0, self.size - 1) * self.size + numpy.clip(x, 0, self.size - 1)
+        return numpy.where(inside, self.distances[indexes], UNREACHABLE)
+
+    def update(self, target):
+        """Recomputes distances to the target cell given as (x, y), unless nothing changed."""
+        if target == self.target and self.grid.version == self.version:
+            return
+        self.target = target
+        self.version = self.grid.version
+
+        cells = self.grid.cells
+        width = self.grid.width
+        start = target[1] * width + target[0]
+        distances = {start: 0}
+        frontier = [start]
+        for distance in range(1, self.max_distance + 1):
+            next_frontier = []
+            for cell in frontier:
+                for neighbour in (cell - 1, cell + width, cell + 1, cell - width):
+                    if neighbour not in distances and not cells[neighbour] & self.obstacles:
+                        distances[neighbour] = distance
+                        next_frontier.append(neighbour)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        self.distances[self.visited] = UNREACHABLE
+        self.origin = (target[0] - self.max_distance, target[1] - self.max_distance)
+        visited = numpy.fromiter(distances.keys(), dtype=numpy.intp, count=len(distances))
+        self.visited = (visited // width - self.origin[1]) * self.size + visited % width - self.origin[0]
+        self.distances[self.visited] = numpy.fromiter(distances.values(), dtype=numpy.int32, count=len(distances))
@@ -0,0 +1,53 @@
+import pygame
+
+import constants
+import assets
+
+
+def get_hud_rect():
+    """Returns the strip of the window above the field, which depends on the scale (see constants.set_scale)."""
+    return pygame.Rect(0, 0, constants.WINDOW_WIDTH, 2 * constants.TILE_SIZE)
+
+
+class Scoreboard:
+    """Time, score and lives displayed above the field.
+
+    The strings are composed of glyphs rasterized once by Assets and the whole strip is
+    redrawn only when one of the values has changed."""
+    def __init__(self):
+        self.rect = get_hud_rect()
+        self.surface = assets.Assets.convert(pygame.Surface(self.rect.size))
+        self.values = None
+
+    def update(self, time, score, lives):
+        """Redraws the strip if any of the values has changed. Returns True if it was redrawn."""
+        values = (time, score, lives)
+        if values == self.values:
+            return False
+        self.values = values
+        self.surface.fill(constants.BACKGROUND_COLOR)
+
+        strings = [
+            f"TIME {time}",
+            f"{score}",
+            f"LIVES {lives}",
+        ]
+        for position, string in enumerate(strings):
+            text_rect = pygame.Rect((0, constants.TILE_SIZE), assets.Assets.get_text_size(string))
+            if position == 0:
+                text_rect.x = constants.TILE_SIZE // 2
+            elif position == 1:
+                text_rect.centerx = constants.WINDOW_WIDTH // 2
+            elif position == 2:
+                text_rect.right = constants.WINDOW_WIDTH - constants.TILE_SIZE // 2
+
+            self.draw_string(string, constants.BLACK_COLOR, text_rect.move(3 * constants.SCALE, constants.SCALE))
+            self.draw_string(string, constants.WHITE_COLOR, text_rect)
+        return True
+
+    def draw_string(self, string, color, rect):
+        x = rect.x
+        for character in string:
+            glyph = assets.Assets.get_glyph(character, color)
+            self.surface.blit(glyph, (x, rect.y))
+            x += glyph.get_width()
@@ -0,0 +1,96 @@
+"""Movement of cell-sized sprites on the tile grid with sub-pixel precision.
+
+Positions and speeds are fixed point numbers - integers in 1/FIXED_ONE of a pixel - so that
+fractional speeds (e.g. 1.5 pixel per tick) add up exactly, while sprites' rects show the
+positions rounded down to whole pixels."""
+import constants
+
+FIXED_SHIFT = 8
+FIXED_ONE = 1 << FIXED_SHIFT
+# Size of a cell in fixed point
+CELL = constants.SPRITE_SIZE * FIXED_ONE
+
+
+def to_fixed(value):
+    """Converts pixels (possibly fractional) to fixed point."""
+    return int(round(value * FIXED_ONE))
+
+
+def to_alignment(position, direction):
+    """Returns distance (in fixed point) to the next position aligned with the cells when
+    moving from given position in given direction (-1 or +1)."""
+    remainder = position % CELL
+    if direction > 0:
+        return CELL - remainder
+    return remainder or CELL
+
+
+def sweep(grid, position, cross, axis, direction, distance, obstacles):
+    """Moves a cell-sized box along an axis (0 - X, 1 - Y) by distance in direction (-1 or +1),
+    stopping at the first line of cells with any of the obstacle flags.
+
+    Position and cross are fixed point coordinates of the box's top left corner along and across
+    the axis. Only cells the box enters are checked, so cells it already overlaps (e.g. a bomb
+    just placed under the player) never block it. Returns the distance travelled and tile
+    coordinates of the blocking cells (empty, unless the box was stopped)."""
+    if direction > 0:
+        edge = position + CELL - 1
+        first, last = edge // CELL + 1, (edge + distance) // CELL
+    else:
+        first, last = position // CELL - 1, (position - distance) // CELL
+    cross_cells = range(cross // CELL, (cross + CELL - 1) // CELL + 1)
+    for line in range(first, last + direction, direction):
+        if axis == 0:
+            blocking = [(line, cell) for cell in cross_cells if grid.get(line, cell) & obstacles]
+        else:
+            blocking = [(cell, line) for cell in cross_cells if grid.get(cell, line) & obstacles]
+        if blocking:
+            if direction > 0:
+                return line * CELL - CELL - position, blocking
+            return position - (line + 1) * CELL, blocking
+    return distance, []
+
+
+class Body:
+    """Fixed point position of a sprite's rect. When the rect is moved from outside (e.g. when
+    the level starts), the body moves along, dropping its sub-pixel part."""
+    def __init__(self, rect):
+        self.rect = rect
+        self.x = rect.x << FIXED_SHIFT
+        self.y = rect.y << FIXED_SHIFT
+
+    def sync(self):
+        if self.x >> FIXED_SHIFT != self.rect.x or self.y >> FIXED_SHIFT != self.rect.y:
+            self.x = self.rect.x << FIXED_SHIFT
+            self.y = self.rect.y << FIXED_SHIFT
+
+    def set(self, x, y):
+        self.x, self.y = x, y
+        self.rect.x = x >> FIXED_SHIFT
+        self.rect.y = y >> FIXED_SHIFT
+
+    def move(self, grid, axis, direction, speed, obstacles):
+        """Moves by speed (in fixed point) along the axis, as far as the obstacles let it.
+
+        A body stopped by a single cell, while not aligned with the cells across the axis, slides
+        across the axis towards the free one instead, so that it doesn't get stuck at the corners
+        of crossings. Returns whether the body moved."""
+        self.sync()
+        position, cross = (self.x, self.y) if axis == 0 else (self.y, self.x)
+        travelled, blocking = sweep(grid, position, cross, axis, direction, speed, obstacles)
+        position += direction * travelled
+        moved = travelled > 0
+        if not moved and len(blocking) == 1 and cross % CELL:
+            # Slide away from the blocking cell, at most to the alignment
+            side = -1 if blocking[0][1 - axis] > cross // CELL else +1
+            cross += side * min(speed, to_alignment(cross, side))
+            moved = True
+        self.set(*((position, cross) if axis == 0 else (cross, position)))
+        return moved
+
+    def align(self, tolerance):
+        """Snaps to the nearest cell if closer to it than tolerance (in fixed point) on both axes."""
+        self.sync()
+        dx, dy = self.x % CELL, self.y % CELL
+        if min(dx, CELL - dx) <= tolerance and min(dy, CELL - dy) <= tolerance:
+            self.set((self.x + CELL // 2) // CELL * CELL, (self.y + CELL // 2) // CELL * CELL)
@@ -0,0 +1,109 @@
+import numpy
+
+import constants
+import tilegrid
+
+# Stream of the seed's randomness used for layouts, apart from the game's one (see LevelGenerator)
+LAYOUT_STREAM = 1
+
+
+class MapIndex:
+    """Cells of the gamemap grouped by their content as arrays of indexes (y * width + x).
+
+    The gamemap is parsed once, so finding e.g. free cells costs nothing no matter how big it is.
+    Cells missing at the ends of lines shorter than the longest one are hard."""
+    def __init__(self, lines):
+        self.width = max(len(line) for line in lines)
+        self.height = len(lines)
+        text = "".join(line.ljust(self.width, "#") for line in lines)
+        cells = numpy.frombuffer(text.encode("ascii"), dtype=numpy.uint8)
+        # Hard blocks
+        self.hard = numpy.flatnonzero(cells == ord("#"))
+        # Flags of the cells with only the hard blocks, shared by all grids (see tilegrid.TileGrid.reset)
+        self.hard_cells = numpy.where(cells == ord("#"), tilegrid.HARD, 0).astype(numpy.uint8).tobytes()
+        # Cells where soft blocks can be placed ("." are kept free of monsters around the player)
+        self.free = numpy.flatnonzero((cells == ord(" ")) | (cells == ord(".")))
+        # Cells where monsters can be placed
+        self.spawn = numpy.flatnonzero(cells == ord(" "))
+        players = numpy.flatnonzero(cells == ord("o"))
+        if len(players) == 0:
+            raise ValueError("gamemap has no player's place (\"o\")")
+        self.player = self.get_tile(players[0])
+
+    def get_tile(self, index):
+        """Returns (x, y) coordinates of the cell with given index."""
+        y, x = divmod(int(index), self.width)
+        return x, y
+
+
+class Layout:
+    """Places of the level's soft blocks (the last two hide the bonus and the exit) and monsters,
+    kept as arrays of cell indexes until the level starts, so that prepared layouts take little
+    memory even when many games run in one process."""
+    def __init__(self, map_index, level, soft_block_cells, monster_kinds, monster_cells):
+        self.map_index = map_index
+        self.level = level
+        self.soft_block_cells = numpy.array(soft_block_cells, dtype=numpy.int32)
+        self.bonus_type = constants.LEVEL_CONTENT_LIST[level - 1][1]
+        self.monster_kinds = monster_kinds
+        self.monster_cells = numpy.array(monster_cells, dtype=numpy.int32)
+
+    @property
+    def soft_blocks(self):
+        """Tiles of the soft blocks."""
+        return [self.map_index.get_tile(cell) for cell in self.soft_block_cells.tolist()]
+
+    @property
+    def monster_tiles(self):
+        return [self.map_index.get_tile(cell) for cell in self.monster_cells.tolist()]
+
+
+def sample(random, cells, count, excluded=frozenset()):
+    """Returns list of count different cells (or fewer, if there aren't enough) picked randomly from
+    the array of cells, skipping the excluded ones. Unless it's most of the cells, picking costs
+    as much as count, not the number of cells, so it's cheap on huge maps."""
+    available = len(cells) - numpy.isin(numpy.fromiter(excluded, dtype=numpy.intp, count=len(excluded)),
+                                       cells, assume_unique=True).sum()
+    count = min(count, available)
+    if 2 * count > available:
+        return [cell for cell in random.permutation(cells).tolist() if cell not in excluded][:count]
+    chosen = {}
+    while len(chosen) < count:
+        for index in random.randint(len(cells), size=count - len(chosen)).tolist():
+            cell = int(cells[index])
+            if cell not in excluded:
+                chosen[cell] = None
+    return list(chosen)
+
+
+class LevelGenerator:
+    """Generates layouts of the levels from the seed, using randomness apart from the game's one.
+
+    Layouts of the levels which can come next (see prepare) are generated ahead, so that
+    starting a level only places what's in the layout. The same seed gives the same layouts as
+    long as they're prepared and taken in the same order."""
+    def __init__(self, map_index, seed):
+        self.map_index = map_index
+        self.random = numpy.random.RandomState([seed, LAYOUT_STREAM])
+        self.prepared = {}
+
+    def generate(self, level):
+        map_index = self.map_index
+        soft_block_count = 52 + level * 2
+        soft_blocks = sample(self.random, map_index.free, soft_block_count)
+
+        monster_counts = constants.LEVEL_CONTENT_LIST[level - 1][0]
+        monster_cells = sample(self.random, map_index.spawn, sum(monster_counts), frozenset(soft_blocks))
+        monster_kinds = [kind for kind, count in enumerate(monster_counts) for _ in range(count)]
+        return Layout(map_index, level, soft_blocks, monster_kinds[:len(monster_cells)], monster_cells)
+
+    def prepare(self, levels):
+        """Generates layouts of given levels, unless they're already prepared."""
+        for level in levels:
+            if level not in self.prepared and 1 <= level <= len(constants.LEVEL_CONTENT_LIST):
+                self.prepared[level] = self.generate(level)
+
+    def get_layout(self, level):
+        """Returns the prepared layout of the level (or generates it, if it wasn't prepared)."""
+        layout = self.prepared.pop(level, None)
+        return layout if layout is not None else self.generate(level)
@@ -0,0 +1,101 @@
+"""Load test of the game server (see server.py) - many clients in one process, every one playing
+its own match with random input. Prints bandwidth per match and jitter of the snapshots' arrival."""
+import argparse
+import asyncio
+import statistics
+import time
+
+import constants
+import controllers
+import replay
+import server
+
+
+class ClientStats:
+    def __init__(self):
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.snapshots = 0
+        self.full_snapshots = 0
+        self.intervals = []
+
+
+async def run_client(host, port, seed, duration, stats):
+    """Plays a match for duration seconds, sending one input for every received snapshot."""
+    reader, writer = await asyncio.open_connection(host, port)
+    server.write_message(writer, server.HELLO, server.HELLO_PAYLOAD.pack(True, seed))
+    message_type, payload = await server.read_message(reader)
+    _, _, width, height = server.WELCOME_PAYLOAD.unpack(payload)
+    state = server.ClientState(width, height)
+    controller = controllers.RandomController(seed=seed)
+    ticks = 0
+    last_arrival = None
+    end_time = time.perf_counter() + duration
+    try:
+        while time.perf_counter() < end_time:
+            message_type, payload = await server.read_message(reader)
+            if message_type != server.SNAPSHOT:
+                continue
+            arrival = time.perf_counter()
+            if last_arrival is not None:
+                stats.intervals.append(arrival - last_arrival)
+            last_arrival = arrival
+            stats.bytes_received += server.MESSAGE.size + len(payload)
+            stats.snapshots += 1
+            stats.full_snapshots += state.apply(payload)
+
+            ticks += 1
+            bits = replay.encode_input(controller.poll())
+            stats.bytes_sent += server.write_message(writer, server.INPUT,
+                                                     server.INPUT_PAYLOAD.pack(ticks, state.tick, bits))
+    finally:
+        writer.close()
+
+
+def get_report(all_stats, duration, snapshot_interval):
+    """Returns lines with bandwidth per match and jitter of the snapshots' arrival."""
+    matches = len(all_stats)
+    received = sum(stats.bytes_received for stats in all_stats)
+    sent = sum(stats.bytes_sent for stats in all_stats)
+    snapshots = sum(stats.snapshots for stats in all_stats)
+    full_snapshots = sum(stats.full_snapshots for stats in all_stats)
+    # Jitter is the deviation of the intervals between snapshots from the expected one
+    expected = snapshot_interval * constants.TICK_TIME_MS / 1000
+    deviations = sorted(abs(interval - expected) for stats in all_stats for interval in stats.intervals)
+    lines = [f"{matches} matches, {snapshots} snapshots ({full_snapshots} full) in {duration:.1f} s",
+             f"per match: down {received / matches / duration / 1024:.2f} KiB/s, "
+             f"up {sent / matches / duration / 1024:.2f} KiB/s, "
+             f"snapshot avg {received / max(snapshots, 1):.0f} B"]
+    if deviations:
+        intervals = [interval for stats in all_stats for interval in stats.intervals]
+        lines.append(f"snapshot interval avg {1000 * statistics.mean(intervals):.2f} ms "
+                     f"(expected {1000 * expected:.2f} ms), jitter avg {1000 * statistics.mean(deviations):.2f} ms "
+                     f"p99 {1000 * deviations[min(len(deviations) - 1, len(deviations) * 99 // 100)]:.2f} ms "
+                     f"max {1000 * deviations[-1]:.2f} ms")
+    return lines
+
+
+async def run_load_test(host, port, matches, duration, seed):
+    all_stats = [ClientStats() for _ in range(matches)]
+    start_time = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, seed + i, duration, stats) for i, stats in enumerate(all_stats)))
+    return all_stats, time.perf_counter() - start_time
+
+
+def main_load_test():
+    parser = argparse.ArgumentParser(description="Bomberman game server load test")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the server")
+    parser.add_argument("--port", type=int, default=7777, help="port of the server")
+    parser.add_argument("--matches", type=int, default=24, help="number of matches played at once")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of playing")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first match, the next ones get the next seeds")
+    parser.add_argument("--snapshot-interval", type=int, default=1, help="ticks between snapshots, as set on the server")
+    arguments = parser.parse_args()
+
+    all_stats, duration = asyncio.run(run_load_test(arguments.host, arguments.port, arguments.matches,
+                                                    arguments.duration, arguments.seed))
+    print("\n".join(get_report(all_stats, duration, arguments.snapshot_interval)))
+
+
+if __name__ == '__main__':
+    main_load_test()
@@ -1,15 +1,31 @@
+import time
+
+# When the game started, for the startup report (see --startup-report)
+START_TIME = time.perf_counter()
+
+import argparse
 import copy
+import gc
 import os
 import sys
 
-import tracemalloc
 import pygame
 import numpy
-import time
 
+import animation
 import assets
 import constants
 import characters
+import controllers
+import fieldview
+import hud
+import kinematics
+import levels
+import monsterengine
+import profiler
+import scheduler
+import spatialhash
+import tilegrid
 
 X_CHANGE = {
     pygame.K_LEFT: -1,
@@ -22,103 +38,202 @@ Y_CHANGE = {
 }
 
 
+# Collision test of the player with bombs and soft blocks when placing a bomb
+COLLIDE_PLACING = pygame.sprite.collide_rect_ratio(0.8)
+# Stands for a cell of the grid in collision tests of sprites
+CELL = pygame.sprite.Sprite()
+
+
+def get_field_view_rect():
+    """Returns the part of the screen below the scoreboard, through which the field is seen."""
+    return pygame.Rect(0, 2 * constants.TILE_SIZE, constants.WINDOW_WIDTH,
+                       constants.WINDOW_HEIGHT - 2 * constants.TILE_SIZE)
+
+
 class Game:
-    def __init__(self, screen):
+    """State and logic of the game. Without a screen (headless mode) the game can be updated,
+    but not drawn. Input is supplied by the controller, which defaults to the keyboard.
+    All randomness comes from the seed, so the same seed and input give the same game.
+    Optionally the game keeps the board - its state as an array (see boardstate.Board), which
+    is kept in board_array if given. Cells of the grid can be given as well (see tilegrid.TileGrid)."""
+    def __init__(self, screen, dirty_rects=False, controller=None, seed=None, board=False, board_array=None,
+                 grid_cells=None):
         # Game variables
+        self.seed = seed if seed is not None else int.from_bytes(os.urandom(4), "little")
+        self.random = numpy.random.RandomState(self.seed)
         self.level = 1
         self.time = 200 * constants.TICK_RATE
         self.score = 0
         self.level_score = 0
 
+        # Occupancy of the cells by hard blocks, soft blocks and bombs used for collisions
+        # Hard blocks (every "#" in gamemap) and standing soft blocks exist only in the grid
+        self.grid = tilegrid.TileGrid(grid_cells)
+        self.field_size = (self.grid.width * constants.SPRITE_SIZE, self.grid.height * constants.SPRITE_SIZE)
+        self.board = None
+        if board:
+            import boardstate  # imported only when needed, to start faster
+            self.board = boardstate.Board(self.grid, board_array)
+
         # Canvas-related variables
         self.screen = screen
-        self.screen_buffor = pygame.Surface((constants.FIELD_WIDTH,
-                                             constants.FIELD_HEIGHT)).convert()
+        # Dirty rects mode - only changed parts of the screen are redrawn and updated
+        self.dirty_rects = dirty_rects
+        self.view_rect = get_field_view_rect()
+        self.field_view = fieldview.FieldView(self.grid, self.view_rect) if screen is not None else None
+        # Screen rects of the sprites drawn in previous frame and the camera they were drawn with
+        self.drawn_rects = []
+        self.camera = None
+        self.scoreboard = hud.Scoreboard() if screen is not None else None
 
         # In-game objects variables
         self.player = pygame.sprite.GroupSingle(characters.Player(0, 0))
         self.player_copy = None
-        # Hardblocks (every "#" in gamemap), which remain the same through all levels
-        self.hard_blocks = pygame.sprite.Group(
-                            [characters.HardBlock((x, y)) for (x, y, cell)
-                             in assets.Assets.get_tiles() if cell == "#"])
-        self.soft_blocks = pygame.sprite.Group()
-        self.bombs = pygame.sprite.Group()
-        self.blasts = pygame.sprite.Group()
-        self.bonuses = pygame.sprite.Group()
-        self.monsters = pygame.sprite.Group()
-        self.events = pygame.event.get()
+        self.create_groups()
+        # Layouts of the levels
+        self.level_generator = levels.LevelGenerator(assets.Assets.MAP_INDEX, self.seed)
+        # Moves all monsters at once
+        self.monster_engine = monsterengine.MonsterEngine(self.grid, self.random)
+        # Clocks of the animations shared by the sprites
+        self.animator = animation.Animator()
+
+        # Input of the current tick, polled once at its start
+        self.controller = controller if controller is not None else controllers.KeyboardController()
+        self.input = controllers.NO_INPUT
+
+        # Stages of every tick in order of running, timed when the game has a profiler
+        self.stages = [
+            ("poll_input", self.poll_input),
+            ("count_down", self.count_down),
+            ("check_player_death", self.check_player_death),
+            ("move_player", self.move_player),
+            ("place_bomb", self.place_bomb),
+            ("detonate_remotely", self.detonate_remotely),
+            ("check_collisions", self.check_collisions),
+            ("animation", self.animator.tick),
+            ("player", lambda: self.player.update(self.input.pressed, self.animator)),
+            ("monsters", lambda: self.monsters.update(self.animator)),
+            ("monster_engine", self.move_monsters),
+            ("bombs", lambda: self.bombs.update(self.animator)),
+            ("blasts", lambda: self.blasts.update(self.animator)),
+            ("bonuses", lambda: self.bonuses.update()),
+            ("soft_blocks", lambda: self.soft_blocks.update(self.animator)),
+            ("board", self.update_board),
+            ("prepare_levels", self.prepare_levels),
+        ]
+        self.profiler = None
 
     def initialize_level(self, level):
         # Reset game variables (in case of leftovers from previous level/life)
-        self.bombs = pygame.sprite.Group()
-        self.blasts = pygame.sprite.Group()
-        self.bonuses = pygame.sprite.Group()
-        self.monsters = pygame.sprite.Group()
+        # Sprites of the previous level are removed from their groups (and the board), so that
+        # they don't keep each other alive, and pooled ones go back to their pools
+        bombs, blasts = self.bombs.sprites(), self.blasts.sprites()
+        for group in (self.bombs, self.blasts, self.bonuses, self.monsters, self.soft_blocks):
+            group.empty()
+        for bomb in bombs:
+            bomb.release()
+        for blast in blasts:
+            characters.BLAST_POOL.release(blast)
+        self.create_groups()
         self.time = 200 * constants.TICK_RATE
         self.level_score = 0
+        self.grid.reset()
+        self.monster_engine.clear()
+        self.camera = None
         # Reset player variables
         self.player.sprite.dead = 0
-        self.player.sprite.frame = 0
-        player_tile = next(t for t in assets.Assets.get_tiles() if t[2] == "o")
+        self.player.sprite.reset_animation()
+        player_tile = assets.Assets.MAP_INDEX.player
         self.player.sprite.rect.x = player_tile[0] * constants.SPRITE_SIZE
         self.player.sprite.rect.y = player_tile[1] * constants.SPRITE_SIZE
         self.player_copy = copy.copy(self.player.sprite)
-        # How many soft blocks will be on the current level
-        soft_block_count = 52 + level * 2
-        free_tiles = [t for t in assets.Assets.get_tiles() if t[2] == " " or t[2] == "."]
-        # Randomize places for soft blocks
-        locations = numpy.ones(len(free_tiles))
-        locations[soft_block_count:] = 0
-        numpy.random.shuffle(locations)
-        # Create list of soft blocks in already randomized positions and add to sprite group
-        soft_block_locations = [(tile[0], tile[1]) for (location, tile)
-                                in zip(locations, free_tiles) if location]
-        numpy.random.shuffle(soft_block_locations)
-        # Randomize places for monsters
-        free_tiles = [(t[0], t[1]) for t in assets.Assets.get_tiles() if t[2] == " "]
-        free_tiles = list(set(free_tiles) - set(soft_block_locations))
-        numpy.random.shuffle(free_tiles)
+        # Places of soft blocks and monsters were already randomized (see prepare_levels)
+        layout = self.level_generator.get_layout(level)
         # Spawn soft_blocks with bonuses
-        bonus_block = soft_block_locations.pop()
-        exit_block = soft_block_locations.pop()
-        self.soft_blocks = pygame.sprite.Group(
-                            [characters.SoftBlock((tile[0], tile[1])) for tile in soft_block_locations])
-        self.soft_blocks.add(characters.SoftBlock(bonus_block, bonus_type=constants.LEVEL_CONTENT_LIST[level - 1][1], bonuses=self.bonuses))
-        self.soft_blocks.add(characters.SoftBlock(exit_block, bonus_type=constants.Bonus.EXIT, bonuses=self.bonuses))
+        soft_block_tiles = layout.soft_blocks
+        for tile in soft_block_tiles[:-2]:
+            self.soft_blocks.place(tile)
+        self.soft_blocks.place(soft_block_tiles[-1], bonus_type=layout.bonus_type)
+        self.soft_blocks.place(soft_block_tiles[-2], bonus_type=constants.Bonus.EXIT)
         # Spawn monsters basing on the list from contants
-        level_content = constants.LEVEL_CONTENT_LIST[level - 1]
-        for monster_name, monster_count in enumerate(level_content[0]):
-            for i in range(monster_count):
-                self.monsters.add(characters.get_monster_by_name(monster_name,
-                                                                 free_tiles.pop(),
-                                                                 self.player.sprite,
-                                                                 self.bombs,
-                                                                 self.soft_blocks,
-                                                                 self.hard_blocks))
+        for monster_name, tile in zip(layout.monster_kinds, layout.monster_tiles):
+            monster = characters.get_monster_by_name(monster_name, tile)
+            self.monsters.add(monster)
+            self.monster_engine.add(monster)
+        self.update_board()
+
+    def prepare_levels(self):
+        """Prepares layouts of the levels which can start next - the same one after the player's
+        death, the next one after finding the exit and the first one after game over."""
+        self.level_generator.prepare([self.level, self.level + 1, 1])
+
+    def create_groups(self):
+        """Creates empty groups of the level's sprites. Sprites colliding with each other are kept
+        in spatial hashes, which also show them in the board (if there's one)."""
+        board = self.board
+        self.bombs = spatialhash.SpatialGroup(layer=board.bombs if board is not None else None)
+        self.blasts = spatialhash.SpatialGroup(layer=board.blasts if board is not None else None)
+        self.bonuses = spatialhash.SpatialGroup(layer=board.bonuses if board is not None else None)
+        self.monsters = spatialhash.SpatialGroup(layer=board.monsters if board is not None else None)
+        self.soft_blocks = characters.SoftBlocks(self.grid, self.bonuses)
 
     def draw(self):
-        # Draw new frame on the buffor
-        self.soft_blocks.draw(self.screen_buffor)
-        self.hard_blocks.draw(self.screen_buffor)
-        self.bombs.draw(self.screen_buffor)
-        self.blasts.draw(self.screen_buffor)
-        self.bonuses.draw(self.screen_buffor)
-        self.monsters.draw(self.screen_buffor)
-        self.player.draw(self.screen_buffor)
-
-        # Blit buffor to screen
+        """Draws new frame and returns list of screen rects that have changed."""
+        camera = self.get_camera()
+        if self.dirty_rects and camera == self.camera:
+            changed_rects = self.draw_changes(camera)
+        else:
+            # Draw the whole field seen through the viewport
+            self.camera = camera
+            self.screen.fill(constants.BACKGROUND_COLOR, self.view_rect)
+            self.field_view.draw_background(self.screen, camera, self.view_rect, self.soft_blocks)
+            self.drawn_rects = self.draw_sprites(camera)
+            changed_rects = [self.screen.get_rect()] if not self.dirty_rects else [self.view_rect.copy()]
+        if self.profiler is None:
+            changed_rects += self.update_scoreboard()
+        else:
+            changed_rects += self.profiler.run("update_scoreboard", self.update_scoreboard)
+        return changed_rects
+
+    def get_stage_names(self):
+        """Returns names of the stages measured by the profiler - stages of the tick and of drawing."""
+        return [name for name, _ in self.stages] + ["update_scoreboard", "draw"]
+
+    def invalidate(self):
+        """Makes the next frame redraw the whole screen, e.g. after something was drawn over it."""
+        self.camera = None
+        if self.scoreboard is not None:
+            self.scoreboard.values = None
+
+    def draw_sprites(self, camera):
+        """Draws soft blocks hit by blasts and everything apart from blocks, which can be seen
+        through the viewport, and returns list of changed screen rects."""
+        view_rect = self.field_view.get_field_rect(self.view_rect, camera)
+        sprites = []
+        for group in [self.soft_blocks, self.bombs, self.blasts, self.bonuses, self.monsters]:
+            sprites += group.get_in_rect(view_rect)
+        sprites.append(self.player.sprite)
+        drawn_rects = self.field_view.draw_sprites(self.screen, camera, sprites)
+        return [rect for rect in drawn_rects if rect.width and rect.height]
+
+    def draw_changes(self, camera):
+        """Restores the background under the sprites drawn in previous frame and draws the
+        sprites again. Returns list of changed screen rects."""
+        changed_rects = self.drawn_rects
+        for rect in changed_rects:
+            self.field_view.draw_background(self.screen, camera, rect, self.soft_blocks)
+        self.drawn_rects = self.draw_sprites(camera)
+        return changed_rects + self.drawn_rects
+
+    def get_camera(self):
+        """Returns position of the field seen in the top left corner of the viewport, so that
+        the player is centered (unless the viewport would go past the field's edges)."""
         player = self.player.sprite
-        blit_start_x = 0
-        player_x = player.rect.x + constants.SPRITE_SIZE // 2
-
-        # Handling window scrolling (actually - not scrolling by the edges)
-        if player_x > constants.WINDOW_WIDTH / 2:
-            blit_start_x = -player_x + constants.WINDOW_WIDTH / 2
-        if player_x > constants.FIELD_WIDTH - constants.WINDOW_WIDTH / 2:
-            blit_start_x = -constants.FIELD_WIDTH + constants.WINDOW_WIDTH
-
-        self.screen.blit(self.screen_buffor, (blit_start_x, 2 * constants.SPRITE_SIZE))
+        camera = []
+        for player_position, field_size, view_size in zip(player.rect.center, self.field_size, self.view_rect.size):
+            view_size //= constants.SCALE
+            camera.append(max(min(player_position - view_size // 2, field_size - view_size), 0))
+        return tuple(camera)
 
     def move_player(self):
         player = self.player.sprite
@@ -127,143 +242,105 @@ class Game:
         if player.dead == 1:
             return
 
-        moved = False
-        pressed = pygame.key.get_pressed()
-        # Adjusting list of colliding objects according to bonuses
-        blocks = [self.hard_blocks]
-        if not player.wall_walker_bonus:
-            blocks.append(self.soft_blocks)
-
-        obstacles = [self.hard_blocks]
+        pressed = self.input.pressed
+        # Adjusting colliding cells according to bonuses
+        obstacles = tilegrid.HARD
         if not player.wall_walker_bonus:
-            obstacles.append(self.soft_blocks)
+            obstacles |= tilegrid.SOFT
         if not player.bomb_walker_bonus:
-            obstacles.append(self.bombs)
+            obstacles |= tilegrid.BOMB
+        speed = kinematics.to_fixed(player.speed)
 
-        # Loop on left and right arrows
+        moved = False
         for key, direction in X_CHANGE.items():
             if pressed[key]:
-                if not player.bomb_walker_bonus:
-                    if pygame.sprite.spritecollide(player, self.bombs, False):
-                        player.rect.x += direction * player.speed
-                        if characters.spritegrouplistcollide(player, blocks, False):
-                            player.rect.x -= direction * player.speed
-                # if collision with bomb occured when not having bomb_walker_bonus player is moved
-                # kinda twice, but then he is moved back, because the collision was detected after all
-                player.rect.x += direction * player.speed
-                moved = True
-                # Moving the player back if the collision occured
-                if characters.spritegrouplistcollide(player, obstacles, False):
-                    test_rect = characters.spritegrouplistcollide(player, blocks, False)
-                    player.rect.x -= direction * player.speed
-                    moved = False
-                    # Aligning the player on the X axis so that he won't get stuck on crossings so often
-                    if len(test_rect) == 1 and player.rect.top % constants.SPRITE_SIZE != 0:
-                        # Two points - upper- and bottom-right/left (according to the direction) are checked for collision
-                        top_point = (player.rect.center[0] + direction * constants.SPRITE_SIZE, player.rect.top)
-                        bottom_point = (player.rect.center[0] + direction * constants.SPRITE_SIZE, player.rect.bottom)
-                        collision_top = test_rect[0].rect.collidepoint(top_point)
-                        collision_bottom = test_rect[0].rect.collidepoint(bottom_point)
-                        # If the collision was only on one of the points - the player is aligned
-                        if collision_top and not collision_bottom:
-                            player.rect.y += player.speed
-                            moved = True
-                        elif not collision_top and collision_bottom:
-                            player.rect.y -= player.speed
-                            moved = True
+                moved = player.body.move(self.grid, 0, direction, speed, obstacles) or moved
 
         # X-axis moving is favoured to avoid some bugs
         if not moved:
             for key, direction in Y_CHANGE.items():
                 if pressed[key]:
-                    if not player.bomb_walker_bonus:
-                        if pygame.sprite.spritecollide(player, self.bombs, False):
-                            player.rect.y += direction * player.speed
-                            if characters.spritegrouplistcollide(player, blocks, False):
-                                player.rect.y -= direction * player.speed
-                    player.rect.y += direction * player.speed
-                    if characters.spritegrouplistcollide(player, obstacles, False):
-                        test_rect = characters.spritegrouplistcollide(player, blocks, False)
-                        player.rect.y -= direction * player.speed
-                        if len(test_rect) == 1 and player.rect.left % constants.SPRITE_SIZE != 0:
-                            left_point  = (player.rect.left,  player.rect.center[1] + direction * constants.SPRITE_SIZE)
-                            right_point = (player.rect.right, player.rect.center[1] + direction * constants.SPRITE_SIZE)
-                            collision_left  = test_rect[0].rect.collidepoint(left_point)
-                            collision_right = test_rect[0].rect.collidepoint(right_point)
-                            if collision_left and not collision_right:
-                                player.rect.x += player.speed
-                            elif not collision_left and collision_right:
-                                player.rect.x -= player.speed
+                    player.body.move(self.grid, 1, direction, speed, obstacles)
 
         # Align player to grid so that he can change directions
-        dx = player.rect.x % constants.SPRITE_SIZE
-        dy = player.rect.y % constants.SPRITE_SIZE
-        if ((dx <= player.speed / 2 or dx >= constants.SPRITE_SIZE - player.speed / 2) and
-            (dy <= player.speed / 2 or dy >= constants.SPRITE_SIZE - player.speed / 2)):
-            player.rect.x = player.get_tile_pos()[0] * constants.SPRITE_SIZE
-            player.rect.y = player.get_tile_pos()[1] * constants.SPRITE_SIZE
+        player.body.align(speed // 2)
 
     def update(self):
+        if self.profiler is None:
+            for _, stage in self.stages:
+                stage()
+        else:
+            self.profiler.begin_tick()
+            for name, stage in self.stages:
+                self.profiler.run(name, stage)
+
+    def count_down(self):
         if self.time > 0:
             self.time -= 1
         else:
             # TODO transform existing monsters into Pontans, spawn 10 Pontans
             pass
-        self.events = pygame.event.get()
-        self.update_scoreboard()
-        self.check_player_death()
-        self.move_player()
-        self.place_bomb()
-        self.detonate_remotely()
-        self.check_collisions()
-
-        # Update sprites
-        self.player.update()
-        self.monsters.update()
-        self.bombs.update()
-        self.blasts.update()
-        self.bonuses.update()
-        self.soft_blocks.update()
-        self.hard_blocks.update()
+
+    def poll_input(self):
+        self.input = self.controller.poll()
+
+    def update_board(self):
+        if self.board is not None:
+            self.board.update(self.player.sprite, self.bombs)
+
+    def move_monsters(self):
+        self.monster_engine.step(self.player.sprite.rect)
+        self.monsters.refresh()
 
     def clear(self):
+        # In dirty rects mode everything is redrawn only where needed
+        if self.dirty_rects:
+            return
         self.screen.fill(constants.BACKGROUND_COLOR)
-        self.screen_buffor.fill(constants.FIELD_COLOR,
-                                rect=pygame.Rect((0, 0),
-                                                 (constants.FIELD_WIDTH, constants.FIELD_HEIGHT)))
 
     def place_bomb(self):
         player = self.player.sprite
-        pressed = pygame.key.get_pressed()
-        if pressed[pygame.K_SPACE]:
+        if self.input.pressed[pygame.K_SPACE]:
             if player.max_bombs > len(self.bombs.sprites()):
                 # Avoiding placing multiple bombs in one place or on softblocks (wall-walker)
-                if not pygame.sprite.spritecollide(player, self.soft_blocks, False, pygame.sprite.collide_rect_ratio(0.8)):
-                    if not pygame.sprite.spritecollide(player, self.bombs, False, pygame.sprite.collide_rect_ratio(0.8)):
-                        self.bombs.add(characters.Bomb(player.get_tile_pos(),
-                                                       player.blast_range,
-                                                       self.blasts,
-                                                       self.hard_blocks,
-                                                       self.soft_blocks,
-                                                       remote=player.detonator_bonus))
+                if not self.collide_cells(player, tilegrid.SOFT, COLLIDE_PLACING):
+                    if not self.bombs.collide_any(player, COLLIDE_PLACING):
+                        self.bombs.add(characters.BOMB_POOL.acquire(player.get_tile_pos(),
+                                                                    player.blast_range,
+                                                                    self.blasts,
+                                                                    self.soft_blocks,
+                                                                    self.grid,
+                                                                    remote=player.detonator_bonus))
 
     def check_collisions(self):
-        collected_bonus = pygame.sprite.groupcollide(self.player, self.bonuses, False, False, pygame.sprite.collide_rect_ratio(0.7))
+        # Only sprites in the neighbouring cells are tested (see SpatialGroup)
+        player = self.player.sprite
+        collected_bonus = self.bonuses.collide(player)
         self.activate_bonus(collected_bonus)
         if not self.player.sprite.mystery_bonus:
-            pygame.sprite.groupcollide(self.monsters, self.player, False, True, pygame.sprite.collide_rect_ratio(0.7))
-        killed_monsters = pygame.sprite.groupcollide(self.blasts, self.monsters, False, False, pygame.sprite.collide_rect_ratio(0.7))
+            if self.monsters.collide_any(player):
+                player.kill()
+        killed_monsters = [monster for monster in self.monsters if self.blasts.collide_any(monster)]
         self.add_points(killed_monsters)
         killed_monsters2 = self.get_killed_in_soft_blocks()
         self.add_points(killed_monsters2)
         if not self.player.sprite.fire_proof_bonus and not self.player.sprite.mystery_bonus:
-            pygame.sprite.groupcollide(self.blasts, self.player, False, True, pygame.sprite.collide_rect_ratio(0.7))
-            for soft_block in self.soft_blocks.sprites():
-                if soft_block.dead:
-                    pygame.sprite.spritecollide(soft_block, self.player, True, pygame.sprite.collide_rect_ratio(0.7))
+            if self.blasts.collide_any(player):
+                player.kill()
+            if self.soft_blocks.collide_any(player):
+                player.kill()
+
+    def collide_cells(self, sprite, mask, collided):
+        """Returns whether the sprite collides with any cell with given flags, testing the cells
+        as if they were sprites."""
+        for rect in self.grid.collide(sprite.rect, mask):
+            CELL.rect = rect
+            if collided(sprite, CELL):
+                return True
+        return False
 
     def check_player_death(self):
-        if self.player.sprite.dead == 1 and int(self.player.sprite.frame) == 7:
+        if self.player.sprite.dead == 1 and self.player.sprite.clock.frame == animation.PLAYER_DEATH.length:
             # Game Over, resetting the game
             if self.player.sprite.lives == -1:
                 self.player.sprite.lives = 2
@@ -290,140 +367,301 @@ class Game:
                 self.initialize_level(self.level)
 
     def update_scoreboard(self):
-        font = assets.Assets.get_font()
-
-        strings = [
-            f"TIME {self.time // constants.TICK_RATE}",
-            f"{self.score}",
-            f"LIVES {self.player.sprite.lives}",
-        ]
-
-        for position, string in enumerate(strings):
-
-            text = font.render(string, True, constants.WHITE_COLOR, constants.BACKGROUND_COLOR)
-            text.set_colorkey(constants.BACKGROUND_COLOR)
-            text_rect = text.get_rect()
-
-            text_shadow = font.render(string, True, constants.BLACK_COLOR, constants.BACKGROUND_COLOR)
-            text_shadow.set_colorkey(constants.BACKGROUND_COLOR)
-            text_shadow_rect = text_shadow.get_rect()
-
-            text_rect.top = constants.SPRITE_SIZE
-            text_shadow_rect.top = constants.SPRITE_SIZE
-
-            if position == 0:
-                text_rect.x = constants.SPRITE_SIZE // 2
-                text_shadow_rect.x = constants.SPRITE_SIZE // 2
-            elif position == 1:
-                text_rect.center = (constants.WINDOW_WIDTH // 2, text_rect.center[1])
-                text_shadow_rect.center = (constants.WINDOW_WIDTH // 2, text_shadow_rect.center[1])
-            elif position == 2:
-                text_rect.right = constants.WINDOW_WIDTH - constants.SPRITE_SIZE // 2
-                text_shadow_rect.right = constants.WINDOW_WIDTH - constants.SPRITE_SIZE // 2
-
-            text_shadow_rect.x += 3
-            text_shadow_rect.y += 1
-
-            self.screen.blit(text_shadow, text_shadow_rect)
-            self.screen.blit(text, text_rect)
+        """Draws time, score and lives above the field. Returns list of changed screen rects."""
+        changed = self.scoreboard.update(self.time // constants.TICK_RATE,
+                                         self.score,
+                                         self.player.sprite.lives)
+        if self.dirty_rects and not changed:
+            return []
+        self.screen.blit(self.scoreboard.surface, self.scoreboard.rect)
+        return [self.scoreboard.rect.copy()]
 
     def activate_bonus(self, collected_bonus):
-        if len(collected_bonus) > 0:
-            for bonuses in collected_bonus.values():
-                for bonus in bonuses:
-                    if bonus.bonus_type == constants.Bonus.EXTRA_BOMB:
-                        self.player.sprite.max_bombs += 1
-                    elif bonus.bonus_type == constants.Bonus.FIRE_RANGE:
-                        self.player.sprite.blast_range += 1
-                    elif bonus.bonus_type == constants.Bonus.SPEEDUP:
-                        self.player.sprite.speed_bonus = True
-                    elif bonus.bonus_type == constants.Bonus.WALL_WALKER:
-                        self.player.sprite.wall_walker_bonus = True
-                    elif bonus.bonus_type == constants.Bonus.DETONATOR:
-                        self.player.sprite.detonator_bonus = True
-                    elif bonus.bonus_type == constants.Bonus.BOMB_WALKER:
-                        self.player.sprite.bomb_walker_bonus = True
-                    elif bonus.bonus_type == constants.Bonus.FLAME_PROOF:
-                        self.player.sprite.flame_proof_bonus = True
-                    elif bonus.bonus_type == constants.Bonus.MYSTERY:
-                        pass
-                        # TODO Mystery bonus, timer etc.
-                    elif bonus.bonus_type == constants.Bonus.EXIT:
-                        if len(self.monsters.sprites()) == 0:
-                            self.level += 1
-                            self.player.sprite.lives += 1
-                            self.initialize_level(self.level)
-                    if bonus.bonus_type != constants.Bonus.EXIT:
-                        bonus.kill()
+        for bonus in collected_bonus:
+            if bonus.bonus_type == constants.Bonus.EXTRA_BOMB:
+                self.player.sprite.max_bombs += 1
+            elif bonus.bonus_type == constants.Bonus.FIRE_RANGE:
+                self.player.sprite.blast_range += 1
+            elif bonus.bonus_type == constants.Bonus.SPEEDUP:
+                self.player.sprite.speed_bonus = True
+            elif bonus.bonus_type == constants.Bonus.WALL_WALKER:
+                self.player.sprite.wall_walker_bonus = True
+            elif bonus.bonus_type == constants.Bonus.DETONATOR:
+                self.player.sprite.detonator_bonus = True
+            elif bonus.bonus_type == constants.Bonus.BOMB_WALKER:
+                self.player.sprite.bomb_walker_bonus = True
+            elif bonus.bonus_type == constants.Bonus.FLAME_PROOF:
+                self.player.sprite.flame_proof_bonus = True
+            elif bonus.bonus_type == constants.Bonus.MYSTERY:
+                pass
+                # TODO Mystery bonus, timer etc.
+            elif bonus.bonus_type == constants.Bonus.EXIT:
+                if len(self.monsters.sprites()) == 0:
+                    self.level += 1
+                    self.player.sprite.lives += 1
+                    self.initialize_level(self.level)
+            if bonus.bonus_type != constants.Bonus.EXIT:
+                bonus.kill()
 
     def detonate_remotely(self):
         if self.player.sprite.detonator_bonus:
-            for event in self.events:
+            for event in self.input.events:
                 if event.type == pygame.KEYDOWN:
                     if event.key in [pygame.K_LCTRL, pygame.K_RCTRL]:
                         if len(self.bombs.sprites()) > 0:
                             self.bombs.sprites()[0].kill()
 
     def add_points(self, killed_monsters):
-        if len(killed_monsters) > 0:
-            for monsters in killed_monsters.values():
-                for monster in monsters:
-                    if not monster.dead:
-                        self.score += monster.points
-                        self.level_score += monster.points
-                        monster.kill()
+        for monster in killed_monsters:
+            if not monster.dead:
+                self.score += monster.points
+                self.level_score += monster.points
+                monster.kill()
 
     def get_killed_in_soft_blocks(self):
-        killed_monsters = {}
-        collided = pygame.sprite.groupcollide(self.soft_blocks, self.monsters, False, False, pygame.sprite.collide_rect_ratio(0.7))
-        for block, monsters in collided.items():
-            if block.dead:
-                killed_monsters[block] = monsters
+        killed_monsters = []
+        for block in self.soft_blocks:
+            killed_monsters += self.monsters.collide(block)
         return killed_monsters
 
 
+def scale_type(value):
+    """Parses the window scale - a whole number at least 1."""
+    try:
+        scale = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid scale: {value!r} (expected a whole number)")
+    if scale < 1:
+        raise argparse.ArgumentTypeError(f"invalid scale: {scale} (has to be at least 1)")
+    return scale
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Bomberman")
+    parser.add_argument("--no-atlas", action="store_true",
+                        help="slice sprite sheet images on demand instead of caching them")
+    parser.add_argument("--allocations", action="store_true",
+                        help="print average number of surfaces allocated per tick every second")
+    parser.add_argument("--image-swaps", action="store_true",
+                        help="print average number of sprite images swapped by animations per tick every second")
+    parser.add_argument("--scale", type=scale_type, default=1,
+                        help="integer scale of the window, the assets are scaled once when loading")
+    parser.add_argument("--no-asset-cache", action="store_true",
+                        help="decode the sprite sheet and parse the map instead of reading them from assets.cache")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long every phase of the start took, up to the first frame")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="redraw and update only the changed parts of the screen")
+    parser.add_argument("--headless", action="store_true",
+                        help="simulate the game with random input, without a window, as fast as possible")
+    parser.add_argument("--ticks", type=int, default=10000,
+                        help="number of ticks simulated in headless mode")
+    parser.add_argument("--max-frame-skip", type=int, default=constants.MAX_FRAME_SKIP,
+                        help="how many frames in a row can be skipped when the game can't keep up")
+    parser.add_argument("--timing", action="store_true",
+                        help="print frame timing stats every second")
+    parser.add_argument("--seed", type=int,
+                        help="seed of the game's randomness (random by default)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="record the game's input into a replay file")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="replay a recorded game without a window, as fast as possible, and verify it")
+    parser.add_argument("--map", metavar="FILE", default="gamemap.txt",
+                        help="gamemap file - any size, surrounded by hard blocks")
+    parser.add_argument("--profile-csv", metavar="FILE",
+                        help="write durations of every tick's stages into a CSV file and print their percentiles")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="print traced memory and its biggest changes every 10 seconds of the game")
+    return parser.parse_args()
+
+
+def create_profiler(game, csv_path=None):
+    # Input latency is the time from receiving input to presenting the frame showing its effect
+    game.profiler = profiler.StageProfiler(game.get_stage_names() + ["display", "input_latency"])
+    if csv_path:
+        game.profiler.open_csv(csv_path)
+    return game.profiler
+
+
+def freeze_memory():
+    """Moves everything allocated so far (modules, assets) out of the garbage collector's
+    generations, so that collections during the game only scan what the game allocates."""
+    gc.collect()
+    gc.freeze()
+
+
+def initialize_headless(map_path="gamemap.txt", window=False):
+    """Initializes pygame without a display and loads the assets - the setup shared by everything
+    running games headless. With window, a (hidden) window is created before loading, so that
+    the assets are converted to its pixel format for drawing, and it's returned."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # no display is needed
+    pygame.init()
+    screen = pygame.display.set_mode((constants.WINDOW_WIDTH, constants.WINDOW_HEIGHT)) if window else None
+    assets.Assets.load(map_path=map_path)
+    return screen
+
+
+def run_headless(ticks, seed=None, record=None, profile_csv=None, map_path="gamemap.txt", trace_memory=False):
+    """Simulates given number of ticks without a window and prints the tick rate."""
+    initialize_headless(map_path)
+    game = Game(None, seed=seed)
+    game.controller = controllers.RandomController(seed=game.seed)
+    if record:
+        import replay  # imported only when needed, to start faster
+        game.controller = replay.Recorder(record, game.controller, game.seed)
+    if profile_csv:
+        create_profiler(game, profile_csv)
+    game.initialize_level(1)
+    freeze_memory()
+    memory_report = profiler.MemoryReport() if trace_memory else None
+
+    start_time = time.perf_counter()
+    for _ in range(ticks):
+        game.update()
+        if record:
+            game.controller.end_tick(game)
+        if memory_report:
+            memory_report.end_tick()
+    elapsed = time.perf_counter() - start_time
+    print(f"{ticks} ticks in {elapsed:.2f} s ({ticks / elapsed:.0f} ticks per second), "
+          f"{game.animator.swaps / ticks:.2f} image swaps per tick")
+    if record:
+        game.controller.close()
+    if profile_csv:
+        game.profiler.close()
+        print("\n".join(game.profiler.get_report()))
+    if memory_report:
+        memory_report.close()
+    pygame.quit()
+
+
+def run_replay(path, map_path="gamemap.txt"):
+    """Replays a recorded game without a window and prints whether it matches the recording.
+    The game has to be replayed on the map it was recorded on."""
+    import replay  # imported only when needed, to start faster
+    initialize_headless(map_path)
+    controller = replay.Replay(path)
+    game = Game(None, controller=controller, seed=controller.seed)
+    game.initialize_level(1)
+
+    start_time = time.perf_counter()
+    while not controller.finished:
+        game.update()
+        controller.end_tick(game)
+    elapsed = time.perf_counter() - start_time
+    ticks = controller.ticks
+    print(f"{ticks} ticks in {elapsed:.2f} s ({ticks / max(elapsed, 1e-9):.0f} ticks per second)")
+    for mismatch in controller.mismatches:
+        print(mismatch)
+    print("Replay doesn't match the recording" if controller.mismatches else "Replay matches the recording")
+    pygame.quit()
+
+
 def main():
+    arguments = parse_arguments()
+    if arguments.replay:
+        run_replay(arguments.replay, arguments.map)
+        return
+    if arguments.headless:
+        run_headless(arguments.ticks, arguments.seed, arguments.record, arguments.profile_csv, arguments.map,
+                     arguments.tracemalloc)
+        return
+
     # initialization
-    # tracemalloc.start(25)
+    startup = profiler.StartupReport(START_TIME)
+    startup.end_phase("imports")
     pygame.init()
+    startup.end_phase("pygame.init")
+    constants.set_scale(arguments.scale)
     screen = pygame.display.set_mode((constants.WINDOW_WIDTH, constants.WINDOW_HEIGHT))
-    assets.Assets.load()
+    startup.end_phase("window")
+    assets.Assets.load(use_atlas=not arguments.no_atlas, map_path=arguments.map,
+                       cache_path=None if arguments.no_asset_cache else assets.CACHE_PATH)
+    startup.end_phase("assets (cached)" if assets.Assets.cache_hit else "assets")
     pygame.display.set_caption("Bomberman")  # set the window title
     pygame.display.set_icon(assets.Assets.get_image_at(0, 3)) # set the window icon
     pygame.mouse.set_visible(False)  # hide the mouse
     os.environ['SDL_VIDEO_CENTERED'] = '1'  # center the window
 
     # making necessary objects
-    game = Game(screen)
+    game = Game(screen, dirty_rects=arguments.dirty_rects, seed=arguments.seed)
+    keyboard = game.controller
+    if arguments.record:
+        import replay  # imported only when needed, to start faster
+        game.controller = replay.Recorder(arguments.record, game.controller, game.seed)
     game.initialize_level(1)
+    startup.end_phase("game")
+    # Stages are always timed, so that the overlay (toggled with F3) can be shown any time
+    stage_profiler = create_profiler(game, arguments.profile_csv)
+    overlay = profiler.Overlay(stage_profiler, assets.Assets.get_small_font(),
+                               game.view_rect.move(4, 4).topleft)
+    ticks = 0
+    frame_scheduler = scheduler.FixedStepScheduler(max_frame_skip=arguments.max_frame_skip)
+    freeze_memory()
+    memory_report = profiler.MemoryReport() if arguments.tracemalloc else None
 
     # main game loop
-    while True:
-        start_time = time.time()
-
-        # enabling closing the window by system button
-        if pygame.QUIT in [event.type for event in game.events]:
-            break
-
+    running = True
+    while running:
+        # run as many updates as needed to catch up with the time, then draw only the last frame
         game.clear()
-        game.update()
-        game.draw()
-        pygame.display.update()
-        # wait for duration of tick minus time used to process code above
-        pygame.time.wait(int(constants.TICK_TIME_MS - 1000 * (time.time() - start_time)))
-
-    # MEMORY LEAKS CHECK:
-    # # tracemalloc
-    # snapshot = tracemalloc.take_snapshot()
-    # top_stats = snapshot.statistics('traceback')
-    #
-    # # pick the biggest memory block
-    # stat = top_stats[0]
-    # print("%s memory blocks: %.1f KiB" % (stat.count, stat.size / 1024))
-    # for line in stat.traceback.format():
-    #     print(line)
+        # Time of the earliest key event handled since the last presented frame
+        input_time = None
+        # Events are collected while waiting, so that they're timestamped when they arrive
+        for _ in range(frame_scheduler.wait(keyboard.collect)):
+            game.update()
+            if arguments.record:
+                game.controller.end_tick(game)
+            for event, event_time in zip(game.input.events, game.input.event_times):
+                if event.type in (pygame.KEYDOWN, pygame.KEYUP) and event_time is not None:
+                    input_time = event_time if input_time is None else min(input_time, event_time)
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    overlay.toggle()
+                    # The screen under the overlay has to be restored
+                    game.invalidate()
+                # enabling closing the window by system button, in the tick it's polled
+                if event.type == pygame.QUIT:
+                    running = False
+            if not running:
+                break
+
+            if memory_report:
+                memory_report.end_tick()
+
+            ticks += 1
+            if ticks % constants.TICK_RATE == 0:
+                if arguments.allocations:
+                    print(f"Surface allocations per tick: {assets.Assets.allocations / constants.TICK_RATE:.2f}")
+                    assets.Assets.allocations = 0
+                if arguments.image_swaps:
+                    print(f"Image swaps per tick: {game.animator.swaps / constants.TICK_RATE:.2f}")
+                    game.animator.swaps = 0
+                if arguments.timing:
+                    print(frame_scheduler.get_stats())
+        if not running:
+            break
+        changed_rects = stage_profiler.run("draw", game.draw)
+        changed_rects += overlay.draw(screen)
+        stage_profiler.run("display", pygame.display.update, changed_rects)
+        if input_time is not None:
+            stage_profiler.record("input_latency", int((time.perf_counter() - input_time) * 1e9))
+        if startup is not None:
+            startup.end_phase("first frame")
+            if arguments.startup_report:
+                print("\n".join(startup.get_report()))
+            startup = None
+        frame_scheduler.end_frame()
+
+    # memory leaks check
+    if memory_report:
+        memory_report.close()
 
     # quitting
+    if arguments.record:
+        game.controller.close()
+    stage_profiler.close()
+    if arguments.profile_csv:
+        print("\n".join(stage_profiler.get_report()))
     pygame.display.quit()
     pygame.quit()
     sys.exit()
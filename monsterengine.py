@@ -0,0 +1,252 @@
+import numpy
+
+import constants
+import flowfield
+import kinematics
+
+# Change of the position for every direction - LEFT, DOWN, RIGHT, UP
+DELTA_X = numpy.array([-1, 0, 1, 0])
+DELTA_Y = numpy.array([0, 1, 0, -1])
+
+# How far (in cells) paths to the player are searched for
+CHASE_DISTANCE = 60
+# Weight of the path length compared to the straight line distance when choosing direction
+PATH_WEIGHT = 4 * CHASE_DISTANCE * constants.SPRITE_SIZE
+
+
+class MonsterEngine:
+    """Moves all monsters at once, with their state stored in arrays (one element per monster).
+
+    Enemy sprites are only views used for drawing and collisions - the engine writes their
+    positions and directions back after every step. Positions and speeds are kept in fixed
+    point (see kinematics), so that monsters can move by fractions of a pixel per tick. A monster
+    that was killed is deactivated and left for the sprite to play its death animation.
+
+    Chasing monsters follow the shortest path to the player, read from flow fields shared by
+    all monsters with the same obstacles (e.g. Dorias and Pontans pass through soft blocks)."""
+    def __init__(self, grid, random, capacity=32):
+        self.grid = grid
+        # numpy.random.RandomState of the game
+        self.random = random
+        self.cells = numpy.frombuffer(grid.cells, dtype=numpy.uint8)
+        self.flow_fields = {}
+        self.sprites = []
+        self.count = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """Creates (or enlarges, keeping the content) arrays for given number of monsters."""
+        arrays = {
+            "x": numpy.zeros(capacity, dtype=numpy.int32),
+            "y": numpy.zeros(capacity, dtype=numpy.int32),
+            "direction": numpy.zeros(capacity, dtype=numpy.int8),
+            "speed": numpy.zeros(capacity, dtype=numpy.int32),
+            "freeze": numpy.zeros(capacity, dtype=numpy.int32),
+            "turn_ratio": numpy.zeros(capacity),
+            "turn_time": numpy.zeros(capacity, dtype=numpy.int32),
+            "obstacles": numpy.zeros(capacity, dtype=numpy.uint8),
+            "chasing": numpy.zeros(capacity, dtype=bool),
+            "chase_radius": numpy.zeros(capacity),
+            "random_turn_chance": numpy.zeros(capacity),
+            "active": numpy.zeros(capacity, dtype=bool),
+        }
+        for name, array in arrays.items():
+            if self.count:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+
+    def clear(self):
+        self.sprites = []
+        self.count = 0
+        self.active[:] = False
+
+    def add(self, monster):
+        """Starts moving the monster by the engine."""
+        if self.count == len(self.active):
+            self.allocate(2 * self.count)
+        index = self.count
+        self.x[index] = monster.rect.x << kinematics.FIXED_SHIFT
+        self.y[index] = monster.rect.y << kinematics.FIXED_SHIFT
+        self.direction[index] = monster.direction
+        self.speed[index] = kinematics.to_fixed(monster.speed)
+        self.freeze[index] = monster.freeze
+        self.turn_ratio[index] = monster.turn_ratio
+        self.turn_time[index] = monster.turn_time
+        self.obstacles[index] = monster.obstacles
+        self.chasing[index] = monster.chase_radius > 0
+        self.chase_radius[index] = monster.chase_radius
+        self.random_turn_chance[index] = monster.random_turn_chance
+        self.active[index] = True
+        self.sprites.append(monster)
+        self.count += 1
+        monster.engine = self
+        monster.index = index
+
+    def deactivate(self, index):
+        self.active[index] = False
+
+    def get_path_lengths(self, x, y, obstacles, chasing, player_rect):
+        """Returns weighted lengths of the paths to the player going through each of the neighbour
+        cells for the chasing monsters. Directions are then compared by the straight line
+        distance only if the paths are equally long (or the player can't be reached). Positions
+        are given in pixels."""
+        size = constants.SPRITE_SIZE
+        width = self.grid.width
+        player_tile = (player_rect.centerx // size, player_rect.centery // size)
+        cells = (y // size * width + x // size)[:, None] + DELTA_X + DELTA_Y * width
+        lengths = numpy.zeros(cells.shape)
+        for mask in numpy.unique(obstacles[chasing]).tolist():
+            flow_field = self.flow_fields.get(mask)
+            if flow_field is None:
+                flow_field = flowfield.FlowField(self.grid, mask, CHASE_DISTANCE)
+                self.flow_fields[mask] = flow_field
+            flow_field.update(player_tile)
+            rows = chasing & (obstacles == mask)
+            distances = flow_field.get_distances(cells[rows])
+            # Without any path the directions are rated only by the straight line distance
+            reachable = (distances < flowfield.UNREACHABLE).any(axis=1, keepdims=True)
+            lengths[rows] = numpy.where(reachable, distances * PATH_WEIGHT, 0)
+        return lengths
+
+    def step(self, player_rect):
+        """Moves every active monster by one tick."""
+        indices = numpy.flatnonzero(self.active[:self.count])
+        if not len(indices):
+            return
+        count = len(indices)
+        randoms = (self.random.random((count, 4)), self.random.random(count), self.random.random(count))
+
+        def get_path_lengths(pixel_x, pixel_y, obstacles, chasing):
+            if not chasing.any():
+                return 0
+            return self.get_path_lengths(pixel_x, pixel_y, obstacles, chasing, player_rect)
+
+        x, y, direction, freeze = move(lambda name: getattr(self, name)[indices], self.cells, self.grid.width, 0,
+                                       player_rect.x, player_rect.y, randoms, get_path_lengths)
+        self.write_back(indices, x, y, direction, freeze)
+
+    def write_back(self, indices, x, y, direction, freeze):
+        """Stores the new state of the monsters with given indices, and shows it in their sprites."""
+        self.x[indices] = x
+        self.y[indices] = y
+        self.direction[indices] = direction
+        self.freeze[indices] = freeze
+        for index, new_x, new_y, new_direction in zip(indices.tolist(), x.tolist(), y.tolist(), direction.tolist()):
+            sprite = self.sprites[index]
+            sprite.rect.x = new_x >> kinematics.FIXED_SHIFT
+            sprite.rect.y = new_y >> kinematics.FIXED_SHIFT
+            sprite.direction = new_direction
+
+
+def get_blocked(cells, width, x, y, obstacles, offset=0):
+    """Returns which of the sprite-sized rects at given fixed point positions overlap a cell with
+    any of the obstacle flags. Grids of the rects start at given offset of the cells. Monsters
+    never leave the map, which is surrounded by hard blocks."""
+    size = kinematics.CELL
+    left, right = offset + x // size, offset + (x + size - 1) // size
+    top, bottom = y // size * width, (y + size - 1) // size * width
+    return ((cells[top + left] | cells[top + right] | cells[bottom + left] | cells[bottom + right])
+            & obstacles) != 0
+
+
+def move(gather, cells, width, offset, player_x, player_y, randoms, get_path_lengths):
+    """Computes one tick of the monsters whose state gather returns (an array by the name of
+    MonsterEngine's array). Offset of their grids in the cells and the player's position are
+    either shared by all of them or given per monster. Randoms are the random numbers for the
+    preference of the directions, chasing and turning, and get_path_lengths rates the directions
+    of the chasing monsters (see MonsterEngine.get_path_lengths). Returns the new positions,
+    directions and freeze times."""
+    x = gather("x")
+    y = gather("y")
+    direction = gather("direction").astype(numpy.intp)
+    freeze = gather("freeze")
+    obstacles = gather("obstacles")
+    random_preference, random_chasing, random_turning = randoms
+
+    # Directions in which moving by one pixel doesn't collide with an obstacle
+    one = kinematics.FIXED_ONE
+    possible = ~get_blocked(cells, width, x + one * DELTA_X[:, None], y + one * DELTA_Y[:, None],
+                            obstacles, offset).T
+    any_possible = possible.any(axis=1)
+
+    # Preference of the directions (the lowest first) - random, unless chasing the player
+    pixel_x = x >> kinematics.FIXED_SHIFT
+    pixel_y = y >> kinematics.FIXED_SHIFT
+    dx = (player_x - pixel_x).astype(float)
+    dy = (player_y - pixel_y).astype(float)
+    chasing = (gather("chasing")
+               & (numpy.hypot(dx, dy) <= gather("chase_radius"))
+               & (random_chasing >= gather("random_turn_chance")))
+    rated = numpy.stack([dx, -dy, -dx, dy], axis=1) + get_path_lengths(pixel_x, pixel_y, obstacles, chasing)
+    preference = numpy.where(chasing[:, None], rated, random_preference)
+    preferred = numpy.where(possible, preference, numpy.inf).argmin(axis=1)
+
+    # Directions are changed only in the middle of a cell - when blocked or randomly
+    size = kinematics.CELL
+    rows = numpy.arange(len(x))
+    aligned = any_possible & (x % size == 0) & (y % size == 0)
+    blocked = aligned & ~possible[rows, direction]
+    turning = blocked | (aligned & (random_turning < gather("turn_ratio")))
+    direction = numpy.where(turning, preferred, direction)
+    freeze = numpy.where(blocked, gather("turn_time"), freeze)
+
+    # Monsters don't move past the middle of the next cell, so that they can turn there
+    moving = any_possible & (freeze == 0)
+    delta_x = DELTA_X[direction]
+    delta_y = DELTA_Y[direction]
+    position = numpy.where(delta_x != 0, x, y)
+    forward = (delta_x + delta_y) > 0
+    to_alignment = numpy.where(forward, size - position % size, (position - 1) % size + 1)
+    speed = numpy.minimum(gather("speed"), to_alignment) * moving
+    x += delta_x * speed
+    y += delta_y * speed
+    freeze = numpy.where(any_possible & (freeze > 0), freeze - 1, freeze)
+    return x, y, direction, freeze
+
+
+def step_together(engines, player_rects, cells, offsets):
+    """Moves every active monster of the engines (of games stepped together, with grids of
+    the same size) by one tick with one set of array operations.
+
+    Cells is an array with the cells of all their grids, which start at given offsets. Every
+    engine draws as many random numbers from its own random state as when stepped alone, so
+    a game goes on the same no matter how many games are stepped together."""
+    stepped = []
+    for engine, player_rect, offset in zip(engines, player_rects, offsets):
+        indices = numpy.flatnonzero(engine.active[:engine.count])
+        if len(indices):
+            stepped.append((engine, player_rect, offset, indices))
+    if not stepped:
+        return
+
+    def gather(name):
+        return numpy.concatenate([getattr(engine, name)[indices] for engine, _, _, indices in stepped])
+
+    counts = [len(indices) for _, _, _, indices in stepped]
+    bounds = numpy.cumsum([0] + counts).tolist()
+
+    # Random numbers of every engine are drawn in the same order as when it's stepped alone
+    random_preference, random_chasing, random_turning = [], [], []
+    for engine, _, _, indices in stepped:
+        random_preference.append(engine.random.random((len(indices), 4)))
+        random_chasing.append(engine.random.random(len(indices)))
+        random_turning.append(engine.random.random(len(indices)))
+    randoms = (numpy.concatenate(random_preference), numpy.concatenate(random_chasing),
+               numpy.concatenate(random_turning))
+
+    def get_path_lengths(pixel_x, pixel_y, obstacles, chasing):
+        path_lengths = numpy.zeros((len(pixel_x), 4))
+        for (engine, player_rect, _, _), start, end in zip(stepped, bounds, bounds[1:]):
+            if chasing[start:end].any():
+                path_lengths[start:end] = engine.get_path_lengths(pixel_x[start:end], pixel_y[start:end],
+                                                                  obstacles[start:end], chasing[start:end],
+                                                                  player_rect)
+        return path_lengths
+
+    x, y, direction, freeze = move(gather, cells, engines[0].grid.width,
+                                   numpy.repeat([offset for _, _, offset, _ in stepped], counts),
+                                   numpy.repeat([player_rect.x for _, player_rect, _, _ in stepped], counts),
+                                   numpy.repeat([player_rect.y for _, player_rect, _, _ in stepped], counts),
+                                   randoms, get_path_lengths)
+    for (engine, _, _, indices), start, end in zip(stepped, bounds, bounds[1:]):
+        engine.write_back(indices, x[start:end], y[start:end], direction[start:end], freeze[start:end])
@@ -0,0 +1,19 @@
+class Pool:
+    """Keeps released objects of a class, so that they're reused instead of being allocated
+    (and collected) over and over. Reused objects are reinitialized with their reset method,
+    which takes the same arguments as the constructor."""
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+        self.allocations = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            item = self.free.pop()
+            item.reset(*args, **kwargs)
+            return item
+        self.allocations += 1
+        return self.cls(*args, **kwargs)
+
+    def release(self, item):
+        self.free.append(item)
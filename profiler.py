@@ -0,0 +1,174 @@
+import collections
+import time
+
+import pygame
+
+import constants
+
+# Percentiles shown in the overlay and the report
+PERCENTILES = (50, 95, 99)
+
+
+class StageProfiler:
+    """Measures how long every stage of a tick takes, so that it's known which stage caused a spike.
+
+    Durations are measured with the monotonic nanosecond counter and the last window samples of
+    every stage are kept for the percentiles. Optionally every tick is written to a CSV file as
+    one row with a column (in microseconds) per stage - stages that didn't run are left empty."""
+    def __init__(self, stage_names, window=10 * constants.TICK_RATE):
+        self.stage_names = list(stage_names)
+        self.samples = {name: collections.deque(maxlen=window) for name in self.stage_names}
+        self.ticks = 0
+        self.row = None
+        self.csv_file = None
+        self.csv_writer = None
+
+    def open_csv(self, path):
+        import csv  # imported only when needed, to start faster
+        self.csv_file = open(path, "w", newline="")
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(["tick"] + self.stage_names)
+
+    def close(self):
+        self.write_row()
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+
+    def begin_tick(self):
+        """Starts a new tick. Stages measured before the next call (e.g. drawing) belong to it."""
+        self.write_row()
+        self.ticks += 1
+        self.row = {}
+
+    def write_row(self):
+        if self.csv_writer is not None and self.row is not None:
+            self.csv_writer.writerow([self.ticks] + [f"{self.row[name] / 1000:.1f}" if name in self.row else ""
+                                                     for name in self.stage_names])
+        self.row = None
+
+    def run(self, name, function, *args):
+        """Calls the function as the stage with given name and returns its result."""
+        start_time = time.perf_counter_ns()
+        result = function(*args)
+        self.record(name, time.perf_counter_ns() - start_time)
+        return result
+
+    def record(self, name, duration):
+        """Adds duration (in nanoseconds) of something measured apart from the stages, e.g. latency."""
+        self.samples[name].append(duration)
+        if self.row is not None:
+            self.row[name] = duration
+
+    def get_percentiles(self, name):
+        """Returns percentiles (see PERCENTILES) of the stage's recent durations in milliseconds."""
+        samples = sorted(self.samples[name])
+        if not samples:
+            return tuple(0.0 for _ in PERCENTILES)
+        return tuple(samples[min(len(samples) - 1, len(samples) * percentile // 100)] / 1e6
+                     for percentile in PERCENTILES)
+
+    def get_report(self):
+        """Returns lines of a table with the percentiles of every stage."""
+        lines = [f"{'stage':<18}" + "".join(f"{f'p{percentile}':>7}" for percentile in PERCENTILES)]
+        for name in self.stage_names:
+            lines.append(f"{name:<18}" + "".join(f"{value:7.3f}" for value in self.get_percentiles(name)))
+        return lines
+
+
+class Overlay:
+    """Table of the profiler's percentiles drawn over the field. It's rendered again only every
+    refresh_ticks ticks, as the text would be unreadable anyway if it changed every frame."""
+    def __init__(self, profiler, font, position, refresh_ticks=constants.TICK_RATE // 2):
+        self.profiler = profiler
+        self.font = font
+        self.position = position
+        self.refresh_ticks = refresh_ticks
+        self.surface = None
+        self.rendered_tick = None
+        self.visible = False
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def render(self):
+        lines = [self.font.render(line, False, constants.WHITE_COLOR, constants.BLACK_COLOR)
+                 for line in self.profiler.get_report()]
+        padding = 4
+        line_height = self.font.get_linesize() + 2
+        width = max(line.get_width() for line in lines) + 2 * padding
+        self.surface = pygame.Surface((width, len(lines) * line_height + 2 * padding))
+        self.surface.fill(constants.BLACK_COLOR)
+        for number, line in enumerate(lines):
+            self.surface.blit(line, (padding, padding + number * line_height))
+        self.rendered_tick = self.profiler.ticks
+
+    def draw(self, screen):
+        """Draws the overlay if it's visible and returns list of changed screen rects."""
+        if not self.visible:
+            return []
+        if self.surface is None or self.profiler.ticks - self.rendered_tick >= self.refresh_ticks:
+            self.render()
+        return [screen.blit(self.surface, self.position)]
+
+
+class MemoryReport:
+    """Traces memory allocations with tracemalloc and prints, every interval ticks, how much
+    memory is traced and which lines allocated the most since the previous report. In a long
+    session without leaks the traced memory stays flat."""
+    def __init__(self, interval=10 * constants.TICK_RATE, frames=25, top=5):
+        self.interval = interval
+        self.top = top
+        self.ticks = 0
+        import tracemalloc  # imported only when needed, to start faster
+        self.tracemalloc = tracemalloc
+        tracemalloc.start(frames)
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        tracemalloc = self.tracemalloc
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def end_tick(self):
+        self.ticks += 1
+        if self.ticks % self.interval == 0:
+            self.report()
+
+    def report(self):
+        current, peak = self.tracemalloc.get_traced_memory()
+        snapshot = self.take_snapshot()
+        print(f"Tick {self.ticks}: {current / 1024:.1f} KiB traced (peak {peak / 1024:.1f} KiB)")
+        for stat in snapshot.compare_to(self.snapshot, "lineno")[:self.top]:
+            print(f"  {stat}")
+        self.snapshot = snapshot
+
+    def close(self):
+        """Prints the biggest memory block still allocated and stops tracing."""
+        stats = self.take_snapshot().statistics("traceback")
+        if stats:
+            stat = stats[0]
+            print(f"{stat.count} memory blocks: {stat.size / 1024:.1f} KiB")
+            for line in stat.traceback.format():
+                print(line)
+        self.tracemalloc.stop()
+
+
+class StartupReport:
+    """Durations of the phases of the game's start, one after another since start_time."""
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.phase_start = start_time
+        self.phases = []
+
+    def end_phase(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.phase_start))
+        self.phase_start = now
+
+    def get_report(self):
+        lines = [f"{name:<20}{1000 * duration:9.1f} ms" for name, duration in self.phases]
+        lines.append(f"{'total':<20}{1000 * (self.phase_start - self.start_time):9.1f} ms")
+        return lines
@@ -0,0 +1,135 @@
+import struct
+import zlib
+
+import pygame
+
+import controllers
+
+# File starts with magic, format version, game's seed and interval of state checksums (in ticks)
+MAGIC = b"BMRP"
+VERSION = 3
+HEADER = struct.Struct("<4sBIH")
+
+# Every tick is stored as one byte of input bits
+INPUT_KEYS = [pygame.K_LEFT, pygame.K_DOWN, pygame.K_RIGHT, pygame.K_UP, pygame.K_SPACE]
+DETONATE_BIT = 1 << 5
+# Set when the tick is followed by records, which end with END_RECORD
+RECORDS_BIT = 1 << 7
+
+END_RECORD = 0
+LEVEL_RECORD = 1  # followed by the new level number (unsigned short)
+CHECKSUM_RECORD = 2  # followed by the state checksum (unsigned int)
+LEVEL = struct.Struct("<H")
+CHECKSUM = struct.Struct("<I")
+
+
+def get_checksum(game):
+    """Returns CRC32 of the game state - game variables, player, grid and monsters."""
+    player = game.player.sprite
+    state = struct.pack("<7i", game.time, game.score, game.level, player.lives,
+                        player.rect.x, player.rect.y, player.dead)
+    checksum = zlib.crc32(state)
+    checksum = zlib.crc32(game.grid.cells, checksum)
+    engine = game.monster_engine
+    for array in (engine.x, engine.y, engine.direction, engine.active):
+        checksum = zlib.crc32(array[:engine.count].tobytes(), checksum)
+    return checksum
+
+
+def encode_input(snapshot):
+    bits = 0
+    for bit, key in enumerate(INPUT_KEYS):
+        if snapshot.pressed[key]:
+            bits |= 1 << bit
+    for event in snapshot.events:
+        if event.type == pygame.KEYDOWN and event.key in [pygame.K_LCTRL, pygame.K_RCTRL]:
+            bits |= DETONATE_BIT
+    return bits
+
+
+def decode_input(bits):
+    pressed = controllers.PressedKeys(key for bit, key in enumerate(INPUT_KEYS) if bits & 1 << bit)
+    events = []
+    if bits & DETONATE_BIT:
+        events.append(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_LCTRL))
+    return controllers.InputSnapshot(pressed, events)
+
+
+class Recorder:
+    """Controller recording input supplied by another controller into a replay file.
+
+    Together with the game's seed it's enough to reproduce the game. Level transitions and
+    state checksums (every checksum_interval ticks) are recorded as well, so that the replay
+    can be verified. end_tick has to be called after every update of the game."""
+    def __init__(self, path, controller, seed, checksum_interval=60):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, checksum_interval))
+        self.controller = controller
+        self.checksum_interval = checksum_interval
+        self.ticks = 0
+        self.level = None
+        self.input = 0
+
+    def poll(self):
+        snapshot = self.controller.poll()
+        self.input = encode_input(snapshot)
+        return snapshot
+
+    def end_tick(self, game):
+        self.ticks += 1
+        records = b""
+        if game.level != self.level:
+            self.level = game.level
+            records += bytes([LEVEL_RECORD]) + LEVEL.pack(game.level)
+        if self.ticks % self.checksum_interval == 0:
+            records += bytes([CHECKSUM_RECORD]) + CHECKSUM.pack(get_checksum(game))
+        if records:
+            self.file.write(bytes([self.input | RECORDS_BIT]) + records + bytes([END_RECORD]))
+        else:
+            self.file.write(bytes([self.input]))
+
+    def close(self):
+        self.file.close()
+
+
+class Replay:
+    """Controller supplying input from a replay file and verifying the recorded level
+    transitions and checksums. end_tick has to be called after every update of the game."""
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = file.read()
+        magic, version, self.seed, self.checksum_interval = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        if version != VERSION:
+            raise ValueError(f"{path} was recorded by another version of the game")
+        self.position = HEADER.size
+        self.ticks = 0
+        self.records = []
+        self.mismatches = []
+
+    @property
+    def finished(self):
+        return self.position >= len(self.data)
+
+    def poll(self):
+        bits = self.data[self.position]
+        self.position += 1
+        self.records = []
+        if bits & RECORDS_BIT:
+            while self.data[self.position] != END_RECORD:
+                record = self.data[self.position]
+                self.position += 1
+                value_format = LEVEL if record == LEVEL_RECORD else CHECKSUM
+                self.records.append((record, value_format.unpack_from(self.data, self.position)[0]))
+                self.position += value_format.size
+            self.position += 1
+        return decode_input(bits)
+
+    def end_tick(self, game):
+        self.ticks += 1
+        for record, value in self.records:
+            if record == LEVEL_RECORD and value != game.level:
+                self.mismatches.append(f"tick {self.ticks}: level {game.level}, recorded {value}")
+            elif record == CHECKSUM_RECORD and value != get_checksum(game):
+                self.mismatches.append(f"tick {self.ticks}: checksum doesn't match the recorded one")
@@ -0,0 +1,84 @@
+import time
+
+import constants
+
+# How often (in seconds) the idle function is called while waiting for the next tick
+IDLE_INTERVAL = 0.001
+
+
+class FixedStepScheduler:
+    """Keeps game updates at a fixed rate, independent of the time spent on drawing.
+
+    Elapsed time (measured with a monotonic clock) is accumulated and consumed in whole ticks,
+    so a slow frame is followed by several updates before the next frame is drawn. At most
+    max_frame_skip frames are skipped in a row - any time left above that is dropped, which
+    slows the game down instead of making it unresponsive."""
+    def __init__(self, tick_time=constants.TICK_TIME_MS / 1000, max_frame_skip=constants.MAX_FRAME_SKIP):
+        self.tick_time = tick_time
+        self.max_frame_skip = max_frame_skip
+        self.accumulator = 0
+        self.last_time = time.perf_counter()
+        self.frame_start = self.last_time
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.updates = 0
+        self.skipped_frames = 0
+        self.dropped_ticks = 0
+        self.frame_time_sum = 0
+        self.frame_time_max = 0
+
+    def wait(self, idle=None):
+        """Sleeps until at least one tick is due and returns number of updates to run
+        before drawing the next frame. While sleeping, idle is called (if given) every
+        IDLE_INTERVAL, e.g. to collect input as soon as it arrives."""
+        now = time.perf_counter()
+        self.accumulator += now - self.last_time
+        self.last_time = now
+        if self.accumulator < self.tick_time:
+            self.sleep(self.tick_time - self.accumulator, idle)
+            now = time.perf_counter()
+            self.accumulator += now - self.last_time
+            self.last_time = now
+        self.frame_start = now
+
+        updates = int(self.accumulator / self.tick_time)
+        if updates > self.max_frame_skip + 1:
+            self.dropped_ticks += updates - self.max_frame_skip - 1
+            updates = self.max_frame_skip + 1
+            self.accumulator = updates * self.tick_time
+        self.accumulator -= updates * self.tick_time
+        self.updates += updates
+        self.skipped_frames += updates - 1
+        return updates
+
+    @staticmethod
+    def sleep(duration, idle=None):
+        if idle is None:
+            time.sleep(duration)
+            return
+        end_time = time.perf_counter() + duration
+        while True:
+            idle()
+            remaining = end_time - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, IDLE_INTERVAL))
+
+    def end_frame(self):
+        """Records time spent on updating and drawing the frame."""
+        frame_time = time.perf_counter() - self.frame_start
+        self.frames += 1
+        self.frame_time_sum += frame_time
+        self.frame_time_max = max(self.frame_time_max, frame_time)
+
+    def get_stats(self):
+        """Returns description of timing since the previous call and resets the stats."""
+        frames = max(self.frames, 1)
+        stats = (f"{self.frames} frames, {self.updates} updates, "
+                 f"frame time avg {1000 * self.frame_time_sum / frames:.2f} ms "
+                 f"max {1000 * self.frame_time_max:.2f} ms, "
+                 f"{self.skipped_frames} skipped frames, {self.dropped_ticks} dropped ticks")
+        self.reset_stats()
+        return stats
@@ -0,0 +1,384 @@
+"""Authoritative game server hosting many matches in one process, played over TCP.
+
+Every connection plays its own match, simulated by the server without a window at TICK_RATE.
+Clients only send their input (one message per tick) and receive snapshots of the state. A
+snapshot contains only what changed since the last snapshot acknowledged by the client -
+entities which moved, spawned or died, and chunks of the grid with changed cells.
+
+Messages are framed by MESSAGE (payload length and type). A client starts with HELLO and gets
+WELCOME, then it sends INPUT messages and receives SNAPSHOT messages (see ClientState)."""
+import argparse
+import asyncio
+import collections
+import itertools
+import struct
+import time
+
+import numpy
+import pygame
+
+import constants
+import main
+import replay
+import tilegrid
+
+MESSAGE = struct.Struct("<IB")
+HELLO = 1  # client: seed of the match, if it's given (HELLO_PAYLOAD)
+WELCOME = 2  # server: number and seed of the match, width and height of the map (WELCOME_PAYLOAD)
+INPUT = 3  # client: its tick, tick of the last received snapshot (ack) and input bits of replay (INPUT_PAYLOAD)
+SNAPSHOT = 4  # server: SNAPSHOT_HEADER followed by changed entities, ids of removed entities and changed chunks
+HELLO_PAYLOAD = struct.Struct("<?I")
+WELCOME_PAYLOAD = struct.Struct("<HIHH")
+INPUT_PAYLOAD = struct.Struct("<IIB")
+# Longest payload of a client's message, a client declaring a longer one is disconnected
+MAX_PAYLOAD = max(HELLO_PAYLOAD.size, INPUT_PAYLOAD.size)
+# Tick, tick of the baseline (0 for a full snapshot), time, score, level and lives, then counts of
+# changed entities, removed entities and changed chunks
+SNAPSHOT_HEADER = struct.Struct("<IIiiHbHHH")
+# Id, kind, x, y and detail of the kind (see get_entities)
+ENTITY = struct.Struct("<IBiih")
+ENTITY_ID = struct.Struct("<I")
+# Chunk's coordinates, followed by flags of its cells (row by row, clipped to the map)
+CHUNK = struct.Struct("<HH")
+
+# Kinds of entities
+PLAYER, MONSTER, BOMB, BLAST, BONUS, SOFT_BLOCK = range(6)
+
+# Snapshots kept as baselines for deltas, a client acknowledging an older one gets a full snapshot
+HISTORY_TICKS = constants.TICK_RATE
+# Inputs waiting for their ticks, the oldest ones are dropped when a client sends too many
+MAX_QUEUED_INPUTS = 8
+# Snapshots aren't sent to a client which doesn't keep up with reading them
+MAX_WRITE_BUFFER = 256 * 1024
+
+
+class ProtocolError(Exception):
+    """Raised for a message which breaks the protocol, e.g. with a payload of a wrong size."""
+
+
+async def read_message(reader, max_length=None):
+    """Returns type and payload of the next message, which can't be longer than max_length (if given)."""
+    length, message_type = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+    if max_length is not None and length > max_length:
+        raise ProtocolError(f"message of {length} bytes is too long")
+    return message_type, await reader.readexactly(length)
+
+
+def unpack_payload(payload_struct, payload):
+    if len(payload) != payload_struct.size:
+        raise ProtocolError(f"payload of {len(payload)} bytes, expected {payload_struct.size}")
+    return payload_struct.unpack(payload)
+
+
+def write_message(writer, message_type, payload):
+    """Writes the message and returns its size in bytes."""
+    writer.write(MESSAGE.pack(len(payload), message_type) + payload)
+    return MESSAGE.size + len(payload)
+
+
+def get_entities(game):
+    """Yields (sprite, kind, detail) of every entity of the game. Detail is what's needed to
+    show the entity apart from its position - e.g. the player's direction and death."""
+    player = game.player.sprite
+    yield player, PLAYER, player.dead << 8 | int(player.direction)
+    for monster in game.monsters:
+        yield monster, MONSTER, monster.dead << 8 | int(monster.kind)
+    for bomb in game.bombs:
+        yield bomb, BOMB, int(bomb.remote)
+    for blast in game.blasts:
+        yield blast, BLAST, blast.type << 2 | blast.direction
+    for bonus in game.bonuses:
+        yield bonus, BONUS, int(bonus.bonus_type)
+    for soft_block in game.soft_blocks:
+        yield soft_block, SOFT_BLOCK, soft_block.clock.frame
+
+
+def get_chunk_cells(grid, chunk):
+    cells = grid.get_chunk_rect(chunk)
+    return b"".join(grid.cells[y * grid.width + cells.left:y * grid.width + cells.right]
+                    for y in range(cells.top, cells.bottom))
+
+
+class NetworkController:
+    """Supplies input received from the client, one input per tick. When no input arrives in
+    time, the last pressed keys are held."""
+    def __init__(self):
+        self.inputs = collections.deque(maxlen=MAX_QUEUED_INPUTS)
+        self.bits = 0
+
+    def receive(self, bits):
+        self.inputs.append(bits)
+
+    def poll(self):
+        """Returns input of the current tick."""
+        if self.inputs:
+            self.bits = self.inputs.popleft()
+            return replay.decode_input(self.bits)
+        return replay.decode_input(self.bits & ~replay.DETONATE_BIT)
+
+
+class Match:
+    """Game played by one client. Entities get ids which stay the same as long as they exist,
+    and recent snapshots (entity states by id and versions of the grid's chunks) are kept
+    as baselines for the deltas."""
+    def __init__(self, number, seed, writer):
+        self.number = number
+        self.writer = writer
+        self.controller = NetworkController()
+        self.game = main.Game(None, controller=self.controller, seed=seed)
+        self.game.initialize_level(1)
+        self.tick = 0
+        self.ack = 0
+        self.ids = {}
+        self.numbers = itertools.count(1)
+        self.history = collections.OrderedDict()
+        self.bytes_sent = 0
+
+    def receive_input(self, payload):
+        _, ack, bits = unpack_payload(INPUT_PAYLOAD, payload)
+        self.controller.receive(bits)
+        # Acks only go forward, and only to snapshots which can be baselines - a bogus one
+        # would otherwise stick and make every following snapshot a full one
+        if ack > self.ack and ack in self.history:
+            self.ack = ack
+
+    def update(self):
+        self.game.update()
+        self.tick += 1
+
+    def capture(self):
+        """Returns states of the entities by their ids."""
+        ids = {}
+        entities = {}
+        for sprite, kind, detail in get_entities(self.game):
+            entity_id = self.ids.get(sprite)
+            if entity_id is None:
+                entity_id = next(self.numbers)
+            ids[sprite] = entity_id
+            entities[entity_id] = (kind, sprite.rect.x, sprite.rect.y, detail)
+        # Ids of the sprites which are gone (e.g. pooled blasts) aren't reused
+        self.ids = ids
+        return entities
+
+    def get_snapshot(self):
+        """Records the current state and returns the snapshot payload with its changes since the acked state."""
+        game = self.game
+        grid = game.grid
+        entities = self.capture()
+        chunk_versions = grid.chunk_versions
+        if self.history:
+            # Versions are shared by snapshots as long as no chunk changes
+            previous_versions = self.history[next(reversed(self.history))][1]
+            if previous_versions == chunk_versions:
+                chunk_versions = previous_versions
+        if chunk_versions is grid.chunk_versions:
+            chunk_versions = list(chunk_versions)
+        self.history[self.tick] = (entities, chunk_versions)
+        while len(self.history) > HISTORY_TICKS:
+            self.history.popitem(last=False)
+
+        baseline = self.history.get(self.ack)
+        if baseline is None:
+            baseline_tick, baseline_entities, changed_chunks = 0, {}, range(len(chunk_versions))
+        else:
+            baseline_tick, (baseline_entities, baseline_versions) = self.ack, baseline
+            if baseline_versions is chunk_versions:
+                changed_chunks = []
+            else:
+                changed_chunks = numpy.flatnonzero(numpy.array(chunk_versions) != numpy.array(baseline_versions))
+
+        changed = [ENTITY.pack(entity_id, *state) for entity_id, state in entities.items()
+                   if baseline_entities.get(entity_id) != state]
+        removed = [ENTITY_ID.pack(entity_id) for entity_id in baseline_entities if entity_id not in entities]
+        chunks = []
+        for index in changed_chunks:
+            chunk = (int(index) % grid.chunks_width, int(index) // grid.chunks_width)
+            chunks.append(CHUNK.pack(*chunk) + get_chunk_cells(grid, chunk))
+        player = game.player.sprite
+        header = SNAPSHOT_HEADER.pack(self.tick, baseline_tick, game.time, game.score, game.level, player.lives,
+                                      len(changed), len(removed), len(chunks))
+        return b"".join([header] + changed + removed + chunks)
+
+    def send_snapshot(self):
+        # A client which doesn't read gets no more snapshots until it catches up
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            return
+        self.bytes_sent += write_message(self.writer, SNAPSHOT, self.get_snapshot())
+
+
+class ClientState:
+    """Client's copy of the match's state, rebuilt from the snapshots. States of the entities are
+    kept for the ticks which can still be baselines of the next snapshots. A full snapshot (with
+    baseline 0) starts from no entities, so it can always be applied - e.g. after the server
+    stopped waiting for acks which were too late."""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+        self.tick = 0
+        self.time = self.score = self.level = self.lives = 0
+        self.entities = {}
+        self.snapshots = {}
+
+    def apply(self, payload):
+        """Applies the snapshot and returns whether it was a full one."""
+        (tick, baseline_tick, self.time, self.score, self.level, self.lives,
+         changed_count, removed_count, chunk_count) = SNAPSHOT_HEADER.unpack_from(payload)
+        if baseline_tick == 0:
+            entities = {}
+        elif baseline_tick in self.snapshots:
+            entities = dict(self.snapshots[baseline_tick])
+        else:
+            raise ValueError(f"snapshot {tick} is based on unknown snapshot {baseline_tick}")
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(changed_count):
+            entity_id, *state = ENTITY.unpack_from(payload, offset)
+            entities[entity_id] = tuple(state)
+            offset += ENTITY.size
+        for _ in range(removed_count):
+            del entities[ENTITY_ID.unpack_from(payload, offset)[0]]
+            offset += ENTITY_ID.size
+        for _ in range(chunk_count):
+            chunk_x, chunk_y = CHUNK.unpack_from(payload, offset)
+            offset += CHUNK.size
+            left, top = chunk_x * tilegrid.CHUNK_SIZE, chunk_y * tilegrid.CHUNK_SIZE
+            width = min(tilegrid.CHUNK_SIZE, self.width - left)
+            for y in range(top, min(top + tilegrid.CHUNK_SIZE, self.height)):
+                self.cells[y * self.width + left:y * self.width + left + width] = payload[offset:offset + width]
+                offset += width
+
+        # The server never goes back to snapshots older than the acked one
+        self.snapshots = {snapshot_tick: snapshot for snapshot_tick, snapshot in self.snapshots.items()
+                          if snapshot_tick >= baseline_tick}
+        self.snapshots[tick] = entities
+        self.tick = tick
+        self.entities = entities
+        return baseline_tick == 0
+
+
+class Server:
+    """Runs every match one tick at a time at TICK_RATE and sends snapshots every
+    snapshot_interval ticks. Ticks which are too late are dropped, like in FixedStepScheduler."""
+    def __init__(self, snapshot_interval=1, max_frame_skip=constants.MAX_FRAME_SKIP):
+        self.snapshot_interval = snapshot_interval
+        self.max_frame_skip = max_frame_skip
+        self.matches = {}
+        self.numbers = itertools.count()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.dropped_ticks = 0
+        self.lateness_sum = 0
+        self.lateness_max = 0
+        self.tick_time_sum = 0
+        self.tick_time_max = 0
+        # Bytes sent by match number, matches which ended during the interval included
+        self.bytes_sent = collections.Counter()
+
+    async def handle_client(self, reader, writer):
+        match = None
+        try:
+            message_type, payload = await read_message(reader, MAX_PAYLOAD)
+            if message_type != HELLO:
+                return
+            has_seed, seed = unpack_payload(HELLO_PAYLOAD, payload)
+            match = Match(next(self.numbers) % 0x10000, seed if has_seed else None, writer)
+            grid = match.game.grid
+            write_message(writer, WELCOME, WELCOME_PAYLOAD.pack(match.number, match.game.seed,
+                                                                grid.width, grid.height))
+            self.matches[match.number] = match
+            while True:
+                message_type, payload = await read_message(reader, MAX_PAYLOAD)
+                if message_type == INPUT:
+                    match.receive_input(payload)
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            # Clients which disconnect or break the protocol are dropped quietly
+            pass
+        finally:
+            if match is not None:
+                self.matches.pop(match.number, None)
+            writer.close()
+
+    def tick(self):
+        for match in list(self.matches.values()):
+            match.update()
+            if match.tick % self.snapshot_interval == 0:
+                sent = match.bytes_sent
+                match.send_snapshot()
+                self.bytes_sent[match.number] += match.bytes_sent - sent
+
+    async def run(self, report_interval=None):
+        """Runs the matches forever, printing stats every report_interval seconds (if given)."""
+        tick_time = constants.TICK_TIME_MS / 1000
+        next_tick = time.perf_counter()
+        next_report = next_tick + report_interval if report_interval else None
+        while True:
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Let the connections read the input
+                await asyncio.sleep(0)
+            start_time = time.perf_counter()
+            lateness = start_time - next_tick
+            if lateness > self.max_frame_skip * tick_time:
+                self.dropped_ticks += int(lateness / tick_time)
+                next_tick = start_time
+                lateness = 0
+            self.tick()
+            tick_duration = time.perf_counter() - start_time
+
+            self.ticks += 1
+            self.lateness_sum += lateness
+            self.lateness_max = max(self.lateness_max, lateness)
+            self.tick_time_sum += tick_duration
+            self.tick_time_max = max(self.tick_time_max, tick_duration)
+            next_tick += tick_time
+            if next_report is not None and start_time >= next_report:
+                print(self.get_stats(report_interval))
+                next_report += report_interval
+
+    def get_stats(self, interval):
+        """Returns description of the ticks since the previous call and resets the stats."""
+        ticks = max(self.ticks, 1)
+        bandwidth = sum(self.bytes_sent.values()) / len(self.bytes_sent) if self.bytes_sent else 0
+        stats = (f"{len(self.matches)} matches, {self.ticks} ticks, "
+                 f"tick time avg {1000 * self.tick_time_sum / ticks:.2f} ms max {1000 * self.tick_time_max:.2f} ms, "
+                 f"lateness avg {1000 * self.lateness_sum / ticks:.2f} ms max {1000 * self.lateness_max:.2f} ms, "
+                 f"{self.dropped_ticks} dropped ticks, "
+                 f"{bandwidth / interval / 1024:.2f} KiB/s per match")
+        self.reset_stats()
+        return stats
+
+
+async def serve(host, port, snapshot_interval=1, report_interval=None):
+    server = Server(snapshot_interval)
+    tcp_server = await asyncio.start_server(server.handle_client, host, port)
+    print(f"Serving on {host}:{port}")
+    async with tcp_server:
+        await server.run(report_interval)
+
+
+def main_server():
+    parser = argparse.ArgumentParser(description="Bomberman game server")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=7777, help="port to listen on")
+    parser.add_argument("--map", metavar="FILE", default="gamemap.txt",
+                        help="gamemap file - any size, surrounded by hard blocks")
+    parser.add_argument("--snapshot-interval", type=int, default=1, help="ticks between snapshots sent to clients")
+    parser.add_argument("--report-interval", type=float, default=5,
+                        help="seconds between printed stats (0 disables them)")
+    arguments = parser.parse_args()
+
+    main.initialize_headless(arguments.map)
+    try:
+        asyncio.run(serve(arguments.host, arguments.port, arguments.snapshot_interval,
+                          arguments.report_interval or None))
+    except KeyboardInterrupt:
+        pass
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main_server()
@@ -0,0 +1,104 @@
+import itertools
+
+import pygame
+
+import constants
+
+# Collision test used by the game for sprites touching each other
+COLLIDE = pygame.sprite.collide_rect_ratio(0.7)
+
+
+class SpatialGroup(pygame.sprite.Group):
+    """Sprite group which buckets its sprites by the cell of their center.
+
+    Sprites aren't bigger than a cell, so a sprite can only collide with sprites in the same
+    or neighbouring cells - collision tests cost as much as there are sprites nearby instead
+    of as many as there are sprites in the group. Buckets are updated when sprites are added
+    or removed. Sprites which move have to be relocated (see relocate and refresh). Changes of
+    the buckets are passed to the layer, if given (see board.Layer)."""
+    def __init__(self, *sprites, layer=None):
+        self.layer = layer
+        # Buckets are dicts, so that sprites are always returned in the same order
+        self.buckets = {}
+        self.sprite_cells = {}
+        # Numbers in order of adding, so that sprites are drawn in the same order as by a Group
+        self.sprite_numbers = {}
+        self.numbers = itertools.count()
+        super().__init__(*sprites)
+
+    @staticmethod
+    def get_cell(rect):
+        return rect.centerx // constants.SPRITE_SIZE, rect.centery // constants.SPRITE_SIZE
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        cell = self.get_cell(sprite.rect)
+        self.sprite_cells[sprite] = cell
+        self.sprite_numbers[sprite] = next(self.numbers)
+        self.buckets.setdefault(cell, {})[sprite] = None
+        if self.layer is not None:
+            self.layer.add(sprite, cell)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        cell = self.sprite_cells.pop(sprite)
+        del self.sprite_numbers[sprite]
+        bucket = self.buckets[cell]
+        del bucket[sprite]
+        if not bucket:
+            del self.buckets[cell]
+        if self.layer is not None:
+            self.layer.remove(sprite, cell)
+
+    def relocate(self, sprite):
+        """Moves the sprite to the bucket of its current position."""
+        cell = self.get_cell(sprite.rect)
+        old_cell = self.sprite_cells[sprite]
+        if cell != old_cell:
+            bucket = self.buckets[old_cell]
+            del bucket[sprite]
+            if not bucket:
+                del self.buckets[old_cell]
+            self.sprite_cells[sprite] = cell
+            self.buckets.setdefault(cell, {})[sprite] = None
+            if self.layer is not None:
+                self.layer.move(sprite, old_cell, cell)
+
+    def refresh(self):
+        """Relocates every sprite of the group."""
+        for sprite in self.sprites():
+            self.relocate(sprite)
+
+    def get_nearby(self, rect):
+        """Yields sprites with centers in the cell of the rect's center or in the neighbouring ones."""
+        cell_x, cell_y = self.get_cell(rect)
+        for y in range(cell_y - 1, cell_y + 2):
+            for x in range(cell_x - 1, cell_x + 2):
+                bucket = self.buckets.get((x, y))
+                if bucket:
+                    yield from bucket
+
+    def get_in_rect(self, rect):
+        """Returns list of the group's sprites overlapping given rect, in order of adding."""
+        size = constants.SPRITE_SIZE
+        columns = range(rect.left // size - 1, (rect.right - 1) // size + 2)
+        rows = range(rect.top // size - 1, (rect.bottom - 1) // size + 2)
+        # Checking every sprite is faster when there are fewer of them than cells in the rect
+        if len(self.sprite_cells) < len(columns) * len(rows):
+            return [sprite for sprite in self.sprites() if sprite.rect.colliderect(rect)]
+        sprites = []
+        for y in rows:
+            for x in columns:
+                bucket = self.buckets.get((x, y))
+                if bucket:
+                    sprites += [sprite for sprite in bucket if sprite.rect.colliderect(rect)]
+        sprites.sort(key=self.sprite_numbers.__getitem__)
+        return sprites
+
+    def collide(self, sprite, collided=COLLIDE):
+        """Returns list of the group's sprites colliding with given sprite, like pygame.sprite.spritecollide."""
+        return [other for other in self.get_nearby(sprite.rect) if collided(sprite, other)]
+
+    def collide_any(self, sprite, collided=COLLIDE):
+        """Returns whether any of the group's sprites collides with given sprite."""
+        return any(collided(sprite, other) for other in self.get_nearby(sprite.rect))
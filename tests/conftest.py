@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def headless():
+    # The game loads its files by paths relative to the repository
+    os.chdir(ROOT)
+    main.initialize_headless()
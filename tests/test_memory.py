@@ -0,0 +1,31 @@
+import gc
+import tracemalloc
+
+import controllers
+import main
+
+ROUNDS = 6
+ROUND_TICKS = 200
+WARM_UP_ROUNDS = 2
+
+
+def test_restarting_levels_does_not_grow_memory():
+    game = main.Game(None, seed=5, controller=controllers.RandomController(seed=5))
+    # Garbage left by a level must be freed by reference counting alone, as the collector
+    # seldom gets to it when the game's memory is frozen (see main.freeze_memory)
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        traced = []
+        for _ in range(ROUNDS):
+            game.initialize_level(1)
+            for _ in range(ROUND_TICKS):
+                game.update()
+            traced.append(tracemalloc.get_traced_memory()[0])
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+
+    # Pools and caches fill up in the first rounds, later ones allocate nothing which lasts
+    assert max(traced[WARM_UP_ROUNDS:]) - traced[WARM_UP_ROUNDS] < 8 * 1024
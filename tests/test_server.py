@@ -0,0 +1,96 @@
+import asyncio
+
+import controllers
+import replay
+import server
+
+
+def step(match, client, controller, ack=True):
+    bits = replay.encode_input(controller.poll())
+    match.receive_input(server.INPUT_PAYLOAD.pack(match.tick, client.tick if ack else 0, bits))
+    match.update()
+    return client.apply(match.get_snapshot())
+
+
+def assert_synchronized(match, client):
+    assert client.tick == match.tick
+    assert client.entities == match.history[match.tick][0]
+    assert client.cells == match.game.grid.cells
+
+
+def start_match():
+    match = server.Match(0, 11, None)
+    grid = match.game.grid
+    return match, server.ClientState(grid.width, grid.height), controllers.RandomController(seed=11)
+
+
+def test_client_recovers_after_acks_stall():
+    match, client, controller = start_match()
+    assert step(match, client, controller)
+    for _ in range(10):
+        assert not step(match, client, controller)
+
+    # The acked snapshot falls out of the history, so the server sends full ones
+    fulls = [step(match, client, controller, ack=False) for _ in range(server.HISTORY_TICKS + 10)]
+    assert not fulls[0] and fulls[-1]
+    assert_synchronized(match, client)
+
+    # Once acks arrive again, snapshots are deltas again
+    for _ in range(10):
+        assert not step(match, client, controller)
+    assert_synchronized(match, client)
+
+
+def test_bogus_ack_is_ignored():
+    match, client, controller = start_match()
+    for _ in range(5):
+        step(match, client, controller)
+    ack = match.ack
+    match.receive_input(server.INPUT_PAYLOAD.pack(match.tick, match.tick + 1000, 0))
+    assert match.ack == ack
+    assert not step(match, client, controller)
+
+
+class Writer:
+    def __init__(self):
+        self.closed = False
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def handle(*messages):
+    """Runs the server's handler of a client sending given (type, payload) messages and returns its writer."""
+    async def run():
+        reader = asyncio.StreamReader()
+        for message_type, payload in messages:
+            reader.feed_data(server.MESSAGE.pack(len(payload), message_type) + payload)
+        reader.feed_eof()
+        writer = Writer()
+        game_server = server.Server()
+        await game_server.handle_client(reader, writer)
+        assert not game_server.matches
+        return writer
+    return asyncio.run(run())
+
+
+def test_malformed_messages_drop_the_client():
+    hello = (server.HELLO, server.HELLO_PAYLOAD.pack(True, 11))
+    assert handle((server.HELLO, b"\x01")).closed
+    assert handle(hello, (server.INPUT, b"\x01")).closed
+    assert handle(hello, (server.INPUT, bytes(server.MAX_PAYLOAD + 1))).closed
+
+
+def test_long_message_is_not_read():
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(server.MESSAGE.pack(0xFFFFFFFF, server.INPUT))
+        try:
+            await server.read_message(reader, server.MAX_PAYLOAD)
+        except server.ProtocolError:
+            return True
+        return False
+    assert asyncio.run(run())
@@ -0,0 +1,97 @@
+import pygame
+
+import constants
+import assets
+
+# Cell occupancy flags
+HARD = 1
+SOFT = 2
+BOMB = 4
+
+# Width and height of a chunk in cells
+CHUNK_SIZE = 8
+
+
+class TileGrid:
+    """Occupancy of the gamemap's cells by static obstacles - hard blocks, soft blocks and bombs.
+
+    Every cell is stored as one byte of flags, so checking a cell costs the same no matter how
+    many blocks are on the map and even maps with thousands of cells per side take little memory.
+    Soft blocks and bombs keep their cells up to date themselves. Version is increased on every
+    change, so that data computed from the grid can be cached. Every chunk of CHUNK_SIZE x
+    CHUNK_SIZE cells has its own version as well, so that e.g. images of the chunks are
+    rendered again only when their cells change.
+
+    Cells can be given as a writable buffer (e.g. a memoryview of storage shared by the grids
+    of many games, see multimatch.MultiMatch), otherwise the grid allocates them."""
+    def __init__(self, cells=None):
+        self.width = assets.Assets.MAP_INDEX.width
+        self.height = assets.Assets.MAP_INDEX.height
+        self.cells = cells if cells is not None else bytearray(self.width * self.height)
+        if len(self.cells) != self.width * self.height:
+            raise ValueError(f"grid of {self.width}x{self.height} cells can't be stored in {len(self.cells)} bytes")
+        self.version = 0
+        self.chunks_width = (self.width + CHUNK_SIZE - 1) // CHUNK_SIZE
+        self.chunks_height = (self.height + CHUNK_SIZE - 1) // CHUNK_SIZE
+        self.chunk_versions = [0] * (self.chunks_width * self.chunks_height)
+        # Board notified about changes of the cells, if there's one (see board.Board)
+        self.board = None
+        self.reset()
+        # Movement of the monsters and flow fields don't check the map's bounds
+        for x in range(self.width):
+            if not self.cells[x] & self.cells[(self.height - 1) * self.width + x] & HARD:
+                raise ValueError("gamemap has to be surrounded by hard blocks")
+        for y in range(self.height):
+            if not self.cells[y * self.width] & self.cells[y * self.width + self.width - 1] & HARD:
+                raise ValueError("gamemap has to be surrounded by hard blocks")
+
+    def reset(self):
+        """Clears every cell apart from the hard blocks (every "#" in gamemap)."""
+        self.version += 1
+        self.chunk_versions = [version + 1 for version in self.chunk_versions]
+        self.cells[:] = assets.Assets.MAP_INDEX.hard_cells
+        if self.board is not None:
+            self.board.update_cells()
+
+    def get(self, x, y):
+        """Returns flags of the cell at given tile coordinates. Cells outside the map are hard."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x]
+        return HARD
+
+    def add(self, tile, flag):
+        self.version += 1
+        self.invalidate(tile)
+        self.cells[tile[1] * self.width + tile[0]] |= flag
+        if self.board is not None:
+            self.board.update_cell(tile)
+
+    def remove(self, tile, flag):
+        self.version += 1
+        self.invalidate(tile)
+        self.cells[tile[1] * self.width + tile[0]] &= ~flag
+        if self.board is not None:
+            self.board.update_cell(tile)
+
+    def invalidate(self, tile):
+        """Increases version of the chunk containing the tile, e.g. when it has to look different."""
+        self.chunk_versions[tile[1] // CHUNK_SIZE * self.chunks_width + tile[0] // CHUNK_SIZE] += 1
+
+    def get_chunk_version(self, chunk):
+        return self.chunk_versions[chunk[1] * self.chunks_width + chunk[0]]
+
+    def get_chunk_rect(self, chunk):
+        """Returns rect of the chunk's cells (in cells), clipped to the map."""
+        return pygame.Rect(chunk[0] * CHUNK_SIZE, chunk[1] * CHUNK_SIZE,
+                           min(CHUNK_SIZE, self.width - chunk[0] * CHUNK_SIZE),
+                           min(CHUNK_SIZE, self.height - chunk[1] * CHUNK_SIZE))
+
+    def collide(self, rect, mask):
+        """Returns rects of the cells overlapping given rect which have any of the flags in mask."""
+        size = constants.SPRITE_SIZE
+        collided = []
+        for y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for x in range(rect.left // size, (rect.right - 1) // size + 1):
+                if self.get(x, y) & mask:
+                    collided.append(pygame.Rect(x * size, y * size, size, size))
+        return collided